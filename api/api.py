@@ -1,21 +1,34 @@
+# Installed before the imports below so the startup report (STARTUP_REPORT) covers them
+import core.startup
+core.startup.install()
+
 import os
 import re
-import httpx
 import asyncio
+import secrets
 import db.schema
+import db.embedding
 import db.notion
-import db.state
 import db.posts
 import db.feedback
-from db.triggers import get_pending_triggers, mark_trigger_processed
+import db.triggers
 import generation.text
 import generation.image
 import generation.replies
 import generation.reply
 import hitl.hitl
 import posting.post
-
-from fastapi import FastAPI, HTTPException
+import posting.mastodon
+import ingest.notifications
+import ingest.workers
+import ingest.filters
+import ingest.triggers
+import core.metrics
+import core.tracing
+import core.profiler
+
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from pydantic import BaseModel
 from typing import Optional
@@ -28,85 +41,144 @@ load_dotenv()
 MASTODON_API_URL = os.getenv("MASTODON_API_URL")
 MASTODON_ACCESS_TOKEN = os.getenv("MASTODON_ACCESS_TOKEN")
 
-# Initialize database
-db.schema.init_db()
+# Load the embedding model in the background once the API is up, rather than on the first mention
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "true").lower() in ("1", "true", "yes")
 
 # -------------------- Notion Polling --------------------
+NOTION_SYNC_SECONDS = float(os.getenv("NOTION_SYNC_SECONDS", str(15 * 60)))
+TRIGGER_BATCH_SIZE = int(os.getenv("TRIGGER_BATCH_SIZE", "50"))
+
+# Set by the sync as soon as it inserts triggers
+trigger_signal = ingest.triggers.TriggerSignal()
+
 async def sync_notion_loop():
     while True:
-        db.notion.sync_notion()
-        await asyncio.sleep(15 * 60)
+        try:
+            inserted = await asyncio.to_thread(db.notion.sync_notion)
+            if inserted:
+                trigger_signal.notify(inserted)
+        except Exception as e:
+            print(f"Notion sync failed: {e!r}")
+        await asyncio.sleep(NOTION_SYNC_SECONDS)
 
 async def process_notion_triggers_loop():
     while True:
-        triggers = get_pending_triggers()
-
-        if not triggers:
-            await asyncio.sleep(15 * 60)
-            continue
-
-        additions = [t["diff"] for t in triggers]
-
-        draft = generation.text.generate_post(additions)
-        post = hitl.hitl(draft)
-        if post.status != "rejected":
-            posting.post(post)
-
-        for t in triggers:
-            mark_trigger_processed(t["id"])
-
-        await asyncio.sleep(15 * 60)
-
-# -------------------- Mastodon Polling --------------------
+        await trigger_signal.wait()
+
+        # Drain in bounded batches; anything left after a failure is retried on the next wake-up
+        try:
+            while triggers := db.triggers.get_pending_triggers(TRIGGER_BATCH_SIZE):
+                # One post per topic, each prompt capped at TRIGGER_BATCH_TOKENS
+                for batch in ingest.triggers.plan_batches(triggers):
+                    additions = "\n\n".join(t["diff"] for t in batch)
+
+                    with core.tracing.span("notion.trigger_batch", triggers=len(batch)):
+                        draft = await asyncio.to_thread(generation.text.generate_post, additions)
+                        # The syncs that found these changes belong to the post's waterfall too
+                        draft.trace_ids = [t["trace_id"] for t in batch if t["trace_id"]]
+                        post = await hitl.hitl.hitl_async(draft)
+                        if post.status != "rejected":
+                            await posting.post.post_to_mastodon(post)
+
+                    db.triggers.mark_triggers_processed([t["id"] for t in batch])
+        except Exception as e:
+            print(f"Trigger processing failed: {e!r}")
+
+# -------------------- Mastodon Notifications --------------------
 def strip_html(html):
     return re.sub("<.*?>", "", html)
 
-async def handle_mention(notification, client):
+async def handle_mention(notification):
+    with core.tracing.span("mention", notification_id=notification["id"]):
+        await _handle_mention(notification)
+
+async def _handle_mention(notification):
     status = notification["status"]
 
-    reply_text = generation.reply.generate_reply(status)
+    # Embedding + LLM call; kept off the event loop so other mentions keep moving
+    reply_text = await asyncio.to_thread(generation.reply.generate_reply, status)
     if reply_text is None:
         return
-    post = hitl.hitl(reply_text)
-    posting.post(post)
 
-last_seen_id = db.state.get("mastodon_last_seen")
-async def poll_mastodon():
-    global last_seen_id
-    headers = {"Authorization": f"Bearer {MASTODON_ACCESS_TOKEN}"}
+    # Approval can take up to HITL_APPROVAL_TIMEOUT; the worker moves on to other threads meanwhile
+    task = asyncio.create_task(review_and_post(reply_text))
+    review_tasks.add(task)
+    task.add_done_callback(review_tasks.discard)
 
-    async with httpx.AsyncClient() as client:
-        while True:
-            params = {}
-            if last_seen_id:
-                params["since_id"] = last_seen_id
+# Replies handed off by the mention workers, waiting for approval or being published
+review_tasks: set[asyncio.Task] = set()
 
-            r = await client.get(
-                f"{MASTODON_API_URL}/api/v1/notifications",
-                headers=headers,
-                params=params
-            )
-            notifs = r.json()
+async def review_and_post(draft):
+    try:
+        post = await hitl.hitl.hitl_async(draft)
+        if post.status != "rejected":
+            await posting.post.post_to_mastodon(post)
+    except Exception as e:
+        print(f"Reply review failed: {e!r}")
+
+# Mentions are handled concurrently, one at a time per conversation
+mention_pool = ingest.workers.WorkerPool(handle_mention)
 
-            for n in reversed(notifs):
-                last_seen_id = n["id"]
-                db.state.set("mastodon_last_seen", last_seen_id)
+mention_filter: ingest.filters.MentionFilter | None = None
 
-                if n["type"] == "mention":
-                    await handle_mention(n, client)
+async def ingest_mastodon():
+    global mention_filter
 
-            await asyncio.sleep(15)
+    # Bots, self-mentions, duplicates and capped threads are dropped before generation
+    mention_filter = ingest.filters.MentionFilter()
+
+    # Streaming API with catch-up on reconnect, falling back to adaptive polling
+    await ingest.notifications.NotificationIngester(mention_pool, mention_filter=mention_filter).run()
+
+# -------------------- Queue Metrics --------------------
+# Read at scrape time
+core.metrics.gauge("mention_queue_depth", "Mentions waiting for a worker").set_function(lambda: mention_pool.queued)
+core.metrics.gauge("mention_in_flight", "Mentions being handled").set_function(lambda: mention_pool.in_flight)
+core.metrics.gauge("mention_replies_in_review", "Generated replies awaiting approval or publishing").set_function(
+    lambda: len(review_tasks)
+)
+core.metrics.gauge("notion_triggers_pending", "Unprocessed Notion triggers").set_function(db.triggers.count_pending_triggers)
+core.metrics.gauge("image_pool_ready", "Pre-generated image drafts ready").set_function(
+    lambda: generation.image.image_pool.drafts.qsize()
+)
 
 # -------------------- Lifespan --------------------
+async def warm_up_embedding_model():
+    try:
+        with core.startup.phase("embedding_model"):
+            await asyncio.to_thread(db.embedding.get_embedding_model)
+    except Exception as e:
+        print(f"Embedding model warm-up failed: {e!r}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    mastodon_task = asyncio.create_task(poll_mastodon())
+    with core.startup.phase("init_db"):
+        db.schema.init_db()
+    with core.startup.phase("approvals"):
+        await hitl.hitl.approvals.start()
+    mention_pool.start()
+    mastodon_task = asyncio.create_task(ingest_mastodon())
     notion_sync_task = asyncio.create_task(sync_notion_loop())
     trigger_task = asyncio.create_task(process_notion_triggers_loop())
+    image_pool_task = asyncio.create_task(generation.image.image_pool.run())
+    warmup_task = asyncio.create_task(warm_up_embedding_model()) if EMBEDDING_WARMUP else None
+    core.startup.mark_ready()
+    core.startup.print_report()
     yield
+    if warmup_task:
+        warmup_task.cancel()
+    image_pool_task.cancel()
     mastodon_task.cancel()
     notion_sync_task.cancel()
     trigger_task.cancel()
+    await mention_pool.stop()
+    for task in review_tasks:
+        task.cancel()
+    await asyncio.gather(*review_tasks, return_exceptions=True)
+    await hitl.hitl.approvals.stop()
+    await posting.post.wait_for_archives()
+    await posting.mastodon.close_http_client()
+    core.tracing.flush()
 
 # -------------------- App --------------------
 app = FastAPI(
@@ -114,6 +186,42 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# -------------------- Profiling --------------------
+def check_profiler_access(token: Optional[str]):
+    """Profiling is invisible unless enabled, and always needs the admin token."""
+    if not core.profiler.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Client addresses can't be trusted behind a proxy, so there is no unauthenticated mode
+    if not core.profiler.PROFILER_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling requires PROFILER_TOKEN to be set")
+    if not secrets.compare_digest(token or "", core.profiler.PROFILER_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def profile_response(profile: core.profiler.Profile, format: str):
+    if format == "json":
+        return profile.summary()
+    return PlainTextResponse(profile.collapsed())
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Send `X-Profile: 1` (and the admin token) to sample one request; fetch it via X-Profile-Id."""
+    if not (core.profiler.PROFILER_ENABLED and request.headers.get("x-profile")):
+        return await call_next(request)
+    try:
+        check_profiler_access(request.headers.get("x-admin-token"))
+    except HTTPException as e:
+        return JSONResponse({"detail": e.detail}, status_code=e.status_code)
+
+    profile = core.profiler.begin_request_profile()
+    if profile is None:
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        profile_id = core.profiler.end_request_profile(profile, f"{request.method} {request.url.path}")
+    response.headers["X-Profile-Id"] = str(profile_id)
+    return response
+
 # -------------------- Pydantic Models --------------------
 class FeedbackRequest(BaseModel):
     post_id: int
@@ -139,22 +247,34 @@ async def root():
             "image": "/image",
             "replies": "/replies",
             "feedback": "/feedback",
-            "stats": "/stats"
+            "mentions": "/mentions/stats",
+            "stats": "/stats",
+            "metrics": "/metrics"
         }
     }
 
 # -------------------- Posts Endpoints --------------------
 @app.get("/posts")
-async def get_posts(limit: int = 50, offset: int = 0):
-    """Get all posts"""
-    posts = db.posts.get_all_posts(limit, offset)
-
-    return {
+async def get_posts(limit: int = 50, offset: int = 0, cursor: Optional[str] = None,
+                    status: Optional[str] = None, platform: Optional[str] = None,
+                    type: Optional[str] = None):
+    """Get all posts (pass next_cursor back as cursor for the next page)"""
+    try:
+        posts, next_cursor = db.posts.list_posts(
+            limit, cursor=cursor, offset=offset,
+            status=status, platform=platform, post_type=type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Serialized directly; skips FastAPI's reflective encoding of every dataclass
+    return JSONResponse({
         "count": len(posts),
         "limit": limit,
         "offset": offset,
-        "posts": posts
-    }
+        "next_cursor": next_cursor,
+        "posts": [post.to_dict() for post in posts]
+    })
 
 @app.get("/posts/{post_id}")
 async def get_post(post_id: int):
@@ -163,22 +283,28 @@ async def get_post(post_id: int):
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    return post
+    return post.to_dict()
+
+@app.get("/posts/{post_id}/trace")
+async def get_post_trace(post_id: int):
+    """Waterfall of every traced stage that produced this post"""
+    return await asyncio.to_thread(core.tracing.waterfall, post_id)
 
 # -------------------- Text Endpoints --------------------
 @app.post("/text/generate")
+@core.tracing.traced("api.text_generate")
 async def generate_post():
     """Generate a new image post"""
     try:
         # Generate post using social_agent
         draft = generation.text.generate_image_post()
-        post = hitl.hitl(draft)
+        post = await hitl.hitl.hitl_async(draft)
         if post.status != "rejected":
-            posting.post(post)
+            await posting.post.post_to_mastodon(post)
 
         return {
             "success": True,
-            "post_id": post.post_id,
+            "post_id": post.id,
             "status": post.status,
             "content": post.final_content or post.original_content,
         }
@@ -187,26 +313,38 @@ async def generate_post():
 
 # -------------------- Image Endpoints --------------------
 @app.post("/image/generate")
-async def generate_post():
+@core.tracing.traced("api.image_generate")
+async def generate_post(profile: Optional[str] = None):
     """Generate a new post"""
+    if profile and profile not in generation.image.IMAGE_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown image profile: {profile}")
     try:
-        # Generate post using social_agent
-        draft = generation.image.generate_post()
-        post = hitl.hitl(draft)
+        # Served from the pre-generated pool when possible
+        draft = await generation.image.image_pool.get(profile)
+        post = await hitl.hitl.hitl_async(draft)
+        status = None
         if post.status != "rejected":
-            posting.post(post)
+            status = await posting.post.post_to_mastodon(post)
 
+        # The archived copy (img_url) is written in the background after this returns,
+        # so answer with the image as published on Mastodon
+        media = (status or {}).get("media_attachments") or [{}]
         return {
             "success": True,
-            "post_id": post.post_id,
+            "post_id": post.id,
             "status": post.status,
-            "content": post.img_url,
+            "content": media[0].get("url"),
+            "url": (status or {}).get("url"),
         }
+    except generation.image.DuplicateImageError as e:
+        # Not retried further here: every attempt is a paid prediction
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # -------------------- Replies Endpoints --------------------
 @app.post("/replies/generate")
+@core.tracing.traced("api.replies_generate")
 async def generate_post():
     """Generate a new post"""
     try:
@@ -216,11 +354,18 @@ async def generate_post():
         statuses = []
         posts = []
 
-        for draft in drafts:
-            post = hitl.hitl(draft)
-            if post.status != "rejected":
-                posting.post(post)
-            post_ids.append(post.post_id)
+        # All drafts are sent for review at once and can be approved in any order
+        reviewed = await asyncio.gather(*(hitl.hitl.hitl_async(d) for d in drafts))
+
+        # Approved replies are published concurrently within the rate limit
+        approved = [post for post in reviewed if post.status != "rejected"]
+        results = await posting.post.post_many_to_mastodon(approved)
+        for post, result in zip(approved, results):
+            if isinstance(result, Exception):
+                print(f"Failed to publish post {post.id}: {result}")
+
+        for post in reviewed:
+            post_ids.append(post.id)
             statuses.append(post.status)
             posts.append(post.final_content or post.original_content)
 
@@ -235,20 +380,81 @@ async def generate_post():
 
 # -------------------- Feedback Endpoints --------------------
 @app.get("/feedback")
-async def get_feedbacks(limit: int = 50, offset: int = 0):
-    """Get all feedback"""
-    feedback_records = db.feedback.get_all_feedback(limit, offset)
+async def get_feedbacks(limit: int = 50, offset: int = 0, cursor: Optional[str] = None,
+                        decision: Optional[str] = None):
+    """Get all feedback (pass next_cursor back as cursor for the next page)"""
+    try:
+        feedback_records, next_cursor = db.feedback.list_feedback(
+            limit, cursor=cursor, offset=offset, decision=decision
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return {
+    return JSONResponse({
         "count": len(feedback_records),
         "limit": limit,
         "offset": offset,
-        "feedback": feedback_records
-    }
+        "next_cursor": next_cursor,
+        "feedback": [record.to_dict() for record in feedback_records]
+    })
 
 @app.get("/feedback/{post_id}")
 async def get_feedback(post_id: int):
     """Get all feedback"""
     feedback = db.feedback.get_feedback(post_id)
 
-    return feedback
+    return feedback.to_dict() if feedback else None
+
+# -------------------- Mention Endpoints --------------------
+@app.get("/mentions/stats")
+async def get_mention_stats():
+    """Mention worker pool queue depth and throughput, and filter outcomes"""
+    return {
+        **mention_pool.stats(),
+        "filter": mention_filter.stats() if mention_filter else {},
+    }
+
+# -------------------- Metrics Endpoints --------------------
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of every counter, gauge and histogram"""
+    return PlainTextResponse(core.metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+async def get_stats():
+    """JSON summary of the same metrics (counts, sums and averages)"""
+    return {
+        "mentions": mention_pool.stats(),
+        "filter": mention_filter.stats() if mention_filter else {},
+        "metrics": core.metrics.registry.snapshot(),
+        "startup": core.startup.report(),
+    }
+
+# -------------------- Admin Endpoints --------------------
+@app.get("/admin/profile")
+async def profile_process(seconds: float = 10, interval: float = core.profiler.PROFILER_INTERVAL,
+                          format: str = "collapsed", x_admin_token: Optional[str] = Header(None)):
+    """Sample every thread for `seconds`; collapsed stacks for flamegraph.pl / speedscope, or a JSON summary"""
+    check_profiler_access(x_admin_token)
+    if seconds <= 0:
+        raise HTTPException(status_code=422, detail="seconds must be greater than 0")
+    try:
+        # Sampled from a worker thread, so the event loop (and what blocks it) shows up in the profile
+        profile = await asyncio.to_thread(core.profiler.profile_process, seconds, interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profile_response(profile, format)
+
+@app.get("/admin/profile/{profile_id}")
+async def get_request_profile(profile_id: int, format: str = "collapsed",
+                              x_admin_token: Optional[str] = Header(None)):
+    """A profile captured with the X-Profile request header"""
+    check_profiler_access(x_admin_token)
+    found = core.profiler.get_request_profile(profile_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    label, profile = found
+    if format == "json":
+        return {"request": label, **profile.summary()}
+    return profile_response(profile, format)
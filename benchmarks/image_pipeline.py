@@ -0,0 +1,184 @@
+"""
+End-to-end benchmark of the image post pipeline, fully offline.
+
+Drives the shipping code: generation.image.generate_image_posts_async (fake
+backend, posted-image hashes from the database, variant selection) ->
+hitl.hitl.hitl_async (a fake Telegram bot presses "Approve") ->
+posting.post.post_to_mastodon (the real Mastodon client over a mock HTTP
+transport, with the archive to a local object store in the background).
+
+    python -m benchmarks.image_pipeline --posts 20 --concurrency 4 --latency 2
+"""
+import os
+import tempfile
+
+# Before the app modules read their configuration: a throwaway database,
+# the fake image backend and placeholder credentials
+os.environ["DB_FILE"] = os.path.join(tempfile.mkdtemp(prefix="bench-db-"), "bench.db")
+os.environ["IMAGE_BACKEND"] = "fake"
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "bench")
+os.environ.setdefault("TELEGRAM_CHAT_ID", "0")
+os.environ.setdefault("MASTODON_API_URL", "https://mastodon.invalid")
+
+import time
+import random
+import asyncio
+import argparse
+import itertools
+import statistics
+from types import SimpleNamespace
+from collections import defaultdict
+
+import httpx
+import db.schema
+import db.posts
+import hitl.hitl
+import posting.post
+import posting.mastodon
+import generation.image
+from core.models import PostDraft
+from generation.image_backends import FakeImageBackend, set_image_backend
+from posting.objectstore import LocalObjectStore, set_object_store
+
+timings: dict[str, list[float]] = defaultdict(list)
+
+class timed:
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            timings[self.stage].append(time.perf_counter() - self.start)
+
+# -------------------- Fakes --------------------
+class FakeTelegramBot:
+    """Answers every approval request by pressing its first button ("Approve") after `delay`."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.message_ids = itertools.count(1)
+
+    async def send_photo(self, chat_id, photo, filename=None, caption=None, reply_markup=None):
+        action, _, post_id = reply_markup.inline_keyboard[0][0].callback_data.partition(":")
+        loop = asyncio.get_running_loop()
+        loop.call_later(self.delay, hitl.hitl.approvals.resolve, int(post_id), action)
+        return SimpleNamespace(chat_id=chat_id, message_id=next(self.message_ids))
+
+def fake_mastodon_transport(latency: float) -> httpx.MockTransport:
+    """Media upload takes `latency`, status creation a quarter of it."""
+    ids = itertools.count(1)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.method == "POST" and path == "/api/v2/media":
+            await asyncio.sleep(latency)
+            media_id = next(ids)
+            return httpx.Response(200, json={"id": str(media_id), "url": f"https://mastodon.invalid/media/{media_id}"})
+        if request.method == "POST" and path == "/api/v1/statuses":
+            await asyncio.sleep(latency / 4)
+            status_id = next(ids)
+            return httpx.Response(200, json={"id": str(status_id), "url": f"https://mastodon.invalid/@bench/{status_id}"})
+        return httpx.Response(404, json={"error": f"unexpected {request.method} {path}"})
+
+    return httpx.MockTransport(handler)
+
+def seed_posted_images(count: int, rng: random.Random):
+    """Previously published image posts, as get_posted_image_hashes() reads them."""
+    for i in range(count):
+        draft = PostDraft(type="image", platform="mastodon", original_content="seed",
+                          image_hash=f"{rng.getrandbits(64):016x}")
+        post_id = db.posts.create_post(draft, status="approved")
+        db.posts.update_post_img_url(post_id, f"seed://{i}")
+
+# -------------------- Pipeline --------------------
+async def one_post(args) -> bool:
+    with timed("total"):
+        with timed("generate"):
+            drafts = await generation.image.generate_image_posts_async(args.profile, args.batch_size)
+        if not drafts:
+            return False
+
+        for extra in drafts[1:]:
+            extra.image.close()
+
+        with timed("approval"):
+            post = await hitl.hitl.hitl_async(drafts[0])
+
+        with timed("publish"):
+            await posting.post.post_to_mastodon(post)
+    return True
+
+async def run(args):
+    db.schema.init_db()
+    seed_posted_images(args.history, random.Random(args.seed))
+
+    set_image_backend(FakeImageBackend(
+        latency=args.latency, jitter=args.latency / 4,
+        failure_rate=args.failure_rate, size=args.size, seed=args.seed,
+    ))
+    set_object_store(LocalObjectStore(tempfile.mkdtemp(prefix="bench-store-")))
+    hitl.hitl.approvals.app = SimpleNamespace(bot=FakeTelegramBot(args.approval_delay))
+    posting.mastodon._http_client = httpx.AsyncClient(
+        base_url=os.environ["MASTODON_API_URL"],
+        transport=fake_mastodon_transport(args.mastodon_latency),
+    )
+
+    # The archive runs in the background after publishing; time it where it runs
+    archive_image = posting.post.archive_image
+
+    async def timed_archive(*a, **kw):
+        with timed("archive"):
+            await archive_image(*a, **kw)
+
+    posting.post.archive_image = timed_archive
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    failures = duplicates = 0
+
+    async def worker():
+        nonlocal failures, duplicates
+        async with semaphore:
+            try:
+                if not await one_post(args):
+                    duplicates += 1
+            except Exception as e:
+                print(f"post failed: {e!r}")
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.posts)))
+    await posting.post.wait_for_archives()
+    elapsed = time.perf_counter() - start
+    await posting.mastodon.close_http_client()
+
+    print(f"{args.posts} posts, concurrency {args.concurrency}, {elapsed:.2f}s wall, "
+          f"{args.posts / elapsed:.2f} posts/s, {failures} failed, {duplicates} all-duplicate\n")
+    print(f"{'stage':<10} {'n':>4} {'mean':>8} {'p50':>8} {'p95':>8} {'max':>8}")
+    for stage in ["generate", "approval", "publish", "archive", "total"]:
+        values = sorted(timings.get(stage, []))
+        if not values:
+            continue
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"{stage:<10} {len(values):>4} {statistics.mean(values):>8.3f} "
+              f"{statistics.median(values):>8.3f} {p95:>8.3f} {values[-1]:>8.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--profile", choices=sorted(generation.image.IMAGE_PROFILES), default="quality")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=2.0, help="fake prediction latency (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--size", type=int, default=512, help="synthetic image edge (px)")
+    parser.add_argument("--history", type=int, default=200, help="previously posted images in the database")
+    parser.add_argument("--approval-delay", type=float, default=0.0)
+    parser.add_argument("--mastodon-latency", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=os.getpid())
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Memory and serialization cost of listing posts.
+
+Compares the slotted Post model and its to_dict() serializer against an
+equivalent plain dataclass encoded by FastAPI's jsonable_encoder (what /posts
+used to do).
+
+    python -m benchmarks.models --posts 10000
+"""
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+import dataclasses
+from datetime import datetime, timezone, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from core.models import Post
+
+# The same fields as Post, without slots
+PlainPost = dataclasses.make_dataclass(
+    "PlainPost",
+    [(f.name, f.type, dataclasses.field(default=f.default)) for f in dataclasses.fields(Post)],
+)
+
+def make_rows(n: int) -> list[dict]:
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": i,
+            "platform": "mastodon",
+            "type": "reply" if i % 3 else "text",
+            "original_content": f"Post number {i} about the Suzuka livery. " * 4,
+            "status": "approved",
+            "created_at": start + timedelta(minutes=i),
+            "metadata": {"parent_text": f"parent {i}", "parent_status_id": str(10**17 + i)},
+        }
+        for i in range(n)
+    ]
+
+def measure_memory(cls, rows: list[dict]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [cls(**row) for row in rows]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return after - before
+
+def measure_time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.posts)
+    slotted = [Post(**row) for row in rows]
+    plain = [PlainPost(**row) for row in rows]
+
+    # Metadata dicts are shared by both variants, so this is the per-object overhead
+    mem_plain = measure_memory(PlainPost, rows)
+    mem_slotted = measure_memory(Post, rows)
+
+    t_plain = measure_time(lambda: json.dumps(jsonable_encoder(plain)), args.repeat)
+    t_slotted = measure_time(lambda: json.dumps([p.to_dict() for p in slotted]), args.repeat)
+
+    print(f"{args.posts} posts")
+    print(f"{'variant':<34} {'memory (KiB)':>14} {'serialize (ms)':>16}")
+    print(f"{'dataclass + jsonable_encoder':<34} {mem_plain / 1024:>14.0f} {t_plain * 1000:>16.1f}")
+    print(f"{'slots dataclass + to_dict':<34} {mem_slotted / 1024:>14.0f} {t_slotted * 1000:>16.1f}")
+
+if __name__ == "__main__":
+    main()
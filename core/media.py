@@ -0,0 +1,63 @@
+import os
+import tempfile
+import weakref
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Images larger than this are spilled to an anonymous temp file instead of kept in memory
+IMAGE_SPILL_THRESHOLD = int(os.getenv("IMAGE_SPILL_THRESHOLD", str(8 * 1024 * 1024)))
+
+class ImageBuffer:
+    """
+    Image bytes passed through the pipeline (generation -> approval -> posting)
+    instead of a path in /tmp.
+
+    Small images live in memory; larger ones roll over to an unlinked temp file,
+    so nothing is left behind on disk if the process dies. The buffer is closed
+    once the image is published or rejected, or when it is garbage collected.
+    """
+
+    def __init__(self, extension: str = ".webp", spill_threshold: int = IMAGE_SPILL_THRESHOLD):
+        self.extension = extension
+        self.size = 0
+        self.spill_threshold = spill_threshold
+        self._file = tempfile.SpooledTemporaryFile(max_size=spill_threshold, suffix=extension)
+        self._finalizer = weakref.finalize(self, self._file.close)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, extension: str = ".webp") -> "ImageBuffer":
+        buffer = cls(extension)
+        buffer.write(data)
+        return buffer
+
+    @classmethod
+    def from_file(cls, path: str) -> "ImageBuffer":
+        buffer = cls(os.path.splitext(path)[1] or ".webp")
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                buffer.write(chunk)
+        return buffer
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def getvalue(self) -> bytes:
+        self._file.seek(0)
+        return self._file.read()
+
+    @property
+    def spilled(self) -> bool:
+        """On disk rather than in memory (SpooledTemporaryFile rolls over once writes exceed max_size)."""
+        return self.size > self.spill_threshold
+
+    @property
+    def closed(self) -> bool:
+        return not self._finalizer.alive
+
+    def close(self):
+        self._finalizer()
+
+    def __repr__(self):
+        return f"ImageBuffer({self.size} bytes, {self.extension}, spilled={self.spilled})"
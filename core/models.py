@@ -1,8 +1,14 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, Literal
 from datetime import datetime
+from core.media import ImageBuffer
 
-@dataclass
+# Models use __slots__: no per-instance __dict__, which matters when listing thousands of posts
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+@dataclass(slots=True)
 class PostDraft:
     type: Literal["text", "image", "reply"]
     platform: str
@@ -10,8 +16,11 @@ class PostDraft:
     image_path: Optional[str] = None
     parent_post_id: Optional[int] = None
     metadata: dict = None
+    image: Optional[ImageBuffer] = field(default=None, repr=False)
+    image_hash: Optional[str] = None  # perceptual hash (hex) of the image
+    trace_ids: list[str] = field(default_factory=list, repr=False)  # traces that produced this draft
 
-@dataclass
+@dataclass(slots=True)
 class Post:
     id: int                        # DB primary key
     platform: str
@@ -25,8 +34,30 @@ class Post:
     posted_at: Optional[datetime] = None
     metadata: dict = None
     img_url: Optional[str] = None
+    mastodon_status_id: Optional[str] = None
+    image_hash: Optional[str] = None
+    image: Optional[ImageBuffer] = field(default=None, repr=False)  # in-process only, never stored
 
-@dataclass
+    def to_dict(self) -> dict:
+        """JSON-ready dict built directly from the attributes (no reflection)."""
+        return {
+            "id": self.id,
+            "platform": self.platform,
+            "type": self.type,
+            "original_content": self.original_content,
+            "final_content": self.final_content,
+            "image_path": self.image_path,
+            "parent_post_id": self.parent_post_id,
+            "status": self.status,
+            "created_at": _iso(self.created_at),
+            "posted_at": _iso(self.posted_at),
+            "metadata": self.metadata,
+            "img_url": self.img_url,
+            "mastodon_status_id": self.mastodon_status_id,
+            "image_hash": self.image_hash,
+        }
+
+@dataclass(slots=True)
 class Feedback:
     id: int
     post_id: int
@@ -34,3 +65,13 @@ class Feedback:
     reason: str
     created_at: str
     content: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "post_id": self.post_id,
+            "decision": self.decision,
+            "reason": self.reason,
+            "created_at": _iso(self.created_at),
+            "content": self.content,
+        }
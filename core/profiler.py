@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+import threading
+import itertools
+from collections import Counter, OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Off unless explicitly enabled, and then only usable with the admin token
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")
+if PROFILER_ENABLED and not PROFILER_TOKEN:
+    print("PROFILER_ENABLED is set without PROFILER_TOKEN; profiling endpoints will refuse every request")
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.005"))
+# Per-request profiles kept for retrieval
+PROFILER_KEEP = int(os.getenv("PROFILER_KEEP", "20"))
+
+def frame_label(code) -> str:
+    """Stable per function (not per line), so samples aggregate in flamegraphs."""
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class Profile:
+    """Samples every thread's stack at a fixed interval into collapsed stacks."""
+
+    def __init__(self, interval: float = PROFILER_INTERVAL):
+        self.interval = max(interval, 0.001)
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def sample(self):
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self, seconds: float | None):
+        start = time.perf_counter()
+        deadline = start + seconds if seconds is not None else None
+        while not self._stop.is_set():
+            self.sample()
+            if deadline and time.perf_counter() >= deadline:
+                break
+            self._stop.wait(self.interval)
+        self.duration = time.perf_counter() - start
+
+    def run(self, seconds: float):
+        """Sample for `seconds` in the calling thread."""
+        self._run(seconds)
+        return self
+
+    def start(self):
+        """Sample in a background thread until stop() (or PROFILER_MAX_SECONDS)."""
+        self._thread = threading.Thread(target=self._run, args=(PROFILER_MAX_SECONDS,), name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format, one "frame;frame;frame count" per line."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def summary(self, top: int = 20) -> dict:
+        own = Counter()
+        for stack, count in self.stacks.items():
+            own[stack.rsplit(";", 1)[-1]] += count
+        return {
+            "samples": self.samples,
+            "interval": self.interval,
+            "duration": round(self.duration, 3),
+            "top_frames": [{"frame": frame, "samples": count} for frame, count in own.most_common(top)],
+        }
+
+# Only one process-wide profile at a time; the sampler itself has a cost
+_lock = threading.Lock()
+
+def profile_process(seconds: float, interval: float = PROFILER_INTERVAL) -> Profile:
+    if not _lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+    try:
+        return Profile(interval).run(min(seconds, PROFILER_MAX_SECONDS))
+    finally:
+        _lock.release()
+
+# -------------------- Per-request profiles --------------------
+_ids = itertools.count(1)
+_recent: "OrderedDict[int, tuple[str, Profile]]" = OrderedDict()
+
+def begin_request_profile(interval: float = PROFILER_INTERVAL) -> Profile | None:
+    """Start sampling for one request, or None if another profile is running."""
+    if not _lock.acquire(blocking=False):
+        return None
+    return Profile(interval).start()
+
+def end_request_profile(profile: Profile, label: str) -> int:
+    profile.stop()
+    _lock.release()
+
+    profile_id = next(_ids)
+    _recent[profile_id] = (label, profile)
+    while len(_recent) > PROFILER_KEEP:
+        _recent.popitem(last=False)
+    return profile_id
+
+def get_request_profile(profile_id: int) -> tuple[str, Profile] | None:
+    return _recent.get(profile_id)
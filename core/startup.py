@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+from importlib.abc import MetaPathFinder
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Opt-in: time every module imported during startup and print a breakdown once ready.
+# The import hook is removed again when startup finishes
+STARTUP_REPORT = os.getenv("STARTUP_REPORT", "false").lower() in ("1", "true", "yes")
+STARTUP_REPORT_TOP = int(os.getenv("STARTUP_REPORT_TOP", "15"))
+
+# Close enough to process start: this is imported before anything heavy
+_started = time.perf_counter()
+
+class _TimedLoader:
+    """Wraps a module's loader to time its execution, then hands the module the real one."""
+
+    def __init__(self, loader, timer: "ImportTimer"):
+        self.loader = loader
+        self.timer = timer
+
+    def create_module(self, spec):
+        # Extension modules do most of their work here
+        with self.timer.measure(spec.name):
+            return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = module.__spec__.loader = self.loader
+        with self.timer.measure(module.__name__):
+            self.loader.exec_module(module)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+class ImportTimer(MetaPathFinder):
+    """
+    Import hook recording, per module, the time spent executing it: cumulative
+    (including the modules it imported) and self (excluding them), like
+    `python -X importtime` but collected in-process.
+    """
+
+    def __init__(self):
+        self.cumulative: dict[str, float] = defaultdict(float)
+        self.own: dict[str, float] = defaultdict(float)
+        self._local = threading.local()
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    @contextmanager
+    def measure(self, name: str):
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)  # time spent in nested imports
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            self.cumulative[name] += elapsed
+            self.own[name] += elapsed - nested
+            if stack:
+                stack[-1] += elapsed
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+_timer = ImportTimer()
+_phases: dict[str, float] = {}
+_ready: float | None = None
+
+def install():
+    """Start timing imports; call before importing the rest of the app."""
+    if STARTUP_REPORT:
+        _timer.install()
+
+@contextmanager
+def phase(name: str):
+    """Time one startup step (schema init, bot start, model warm-up...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = round(time.perf_counter() - start, 4)
+
+def mark_ready():
+    """Startup is over: stop timing imports (lazy ones happen on first use)."""
+    global _ready
+    _ready = time.perf_counter() - _started
+    _timer.uninstall()
+
+# -------------------- Report --------------------
+def report(top: int = STARTUP_REPORT_TOP) -> dict:
+    by_package = defaultdict(float)
+    for name, seconds in _timer.own.items():
+        by_package[name.split(".")[0]] += seconds
+
+    slowest = sorted(_timer.cumulative.items(), key=lambda kv: -kv[1])[:top]
+    return {
+        "ready_seconds": round(_ready, 4) if _ready is not None else None,
+        "import_seconds": round(sum(_timer.own.values()), 4),
+        "modules_imported": len(_timer.own),
+        "phases": dict(_phases),
+        "modules": [
+            {"module": name, "cumulative_ms": round(seconds * 1000, 1), "self_ms": round(_timer.own[name] * 1000, 1)}
+            for name, seconds in slowest
+        ],
+        "packages": {
+            name: round(seconds * 1000, 1)
+            for name, seconds in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]
+        },
+    }
+
+def print_report(top: int = STARTUP_REPORT_TOP):
+    if not STARTUP_REPORT:
+        return
+    summary = report(top)
+    print(f"Startup: ready in {summary['ready_seconds']}s, "
+          f"{summary['import_seconds']}s importing {summary['modules_imported']} modules")
+    for name, seconds in summary["phases"].items():
+        print(f"  phase  {name:<40} {seconds * 1000:>9.1f} ms")
+    for m in summary["modules"]:
+        print(f"  import {m['module']:<40} {m['cumulative_ms']:>9.1f} ms (self {m['self_ms']} ms)")
+    for name, ms in summary["packages"].items():
+        print(f"  package {name:<39} {ms:>9.1f} ms")
+
+if __name__ == "__main__":
+    # Import-only breakdown of the API, without starting it: python -m core.startup
+    import core.startup as startup
+    startup.STARTUP_REPORT = True
+    startup.install()
+    import api.api  # noqa: F401
+    startup.mark_ready()
+    startup.print_report()
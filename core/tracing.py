@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import asyncio
+import functools
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "sqlite" (spans table), "jsonl" (TRACE_JSONL_PATH) or "off"
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "sqlite")
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "traces.jsonl")
+# Finished spans are buffered and written in batches
+TRACE_FLUSH_SIZE = int(os.getenv("TRACE_FLUSH_SIZE", "200"))
+TRACE_RETENTION_DAYS = int(os.getenv("TRACE_RETENTION_DAYS", "14"))
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    attributes: dict = field(default_factory=dict)
+    start_time: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    start: float = field(default_factory=time.perf_counter)
+    duration_ms: float | None = None
+    status: str = "ok"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_record(self) -> dict:
+        end_time = self.start_time.timestamp() + (self.duration_ms or 0) / 1000
+        return {
+            "span_id": self.span_id,
+            "trace_id": self.trace_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time.isoformat(),
+            "end_time": datetime.fromtimestamp(end_time, timezone.utc).isoformat(),
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+class _NoopSpan:
+    """Handed out when tracing is off, so callers never need to check."""
+    trace_id = span_id = parent_id = None
+
+    def set(self, **attributes):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+# Follows the pipeline across awaits, tasks and asyncio.to_thread (contexts are copied)
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+
+def current_span() -> Span | None:
+    return _current.get()
+
+def current_trace_id() -> str | None:
+    span = _current.get()
+    return span.trace_id if span else None
+
+# -------------------- Export --------------------
+class SpanBuffer:
+    def __init__(self):
+        self.spans: list[dict] = []
+        self.links: list[tuple[str, int]] = []
+        self.last_prune = 0.0
+        self._lock = threading.Lock()
+        # Held for a whole flush, so a flush returning means every span added before it is written
+        self._flush_lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span.to_record())
+            full = len(self.spans) >= TRACE_FLUSH_SIZE
+        # A finished trace is written right away so its waterfall is complete
+        if full or span.parent_id is None:
+            self.flush_soon()
+
+    def flush_soon(self):
+        """Flush, but never with a blocking SQLite write on the event loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()  # worker thread or script
+            return
+        loop.run_in_executor(None, self.flush)
+
+    def link(self, trace_id: str, post_id: int):
+        with self._lock:
+            self.links.append((trace_id, post_id))
+
+    def flush(self):
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            spans, links = self.spans, self.links
+            self.spans, self.links = [], []
+        if not spans and not links:
+            return
+
+        try:
+            if TRACE_EXPORT == "sqlite":
+                import db.traces
+                db.traces.save_spans(spans, links)
+                if time.monotonic() - self.last_prune > 3600:
+                    self.last_prune = time.monotonic()
+                    db.traces.prune_spans(TRACE_RETENTION_DAYS)
+            elif TRACE_EXPORT == "jsonl":
+                with open(TRACE_JSONL_PATH, "a") as f:
+                    for record in spans:
+                        f.write(json.dumps({"kind": "span", **record}, default=str) + "\n")
+                    for trace_id, post_id in links:
+                        f.write(json.dumps({"kind": "link", "trace_id": trace_id, "post_id": post_id}) + "\n")
+        except Exception as e:
+            print(f"Failed to export {len(spans)} spans: {e!r}")
+
+_buffer = SpanBuffer()
+
+def flush():
+    _buffer.flush()
+
+# -------------------- Spans --------------------
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a pipeline stage. Nested spans (in the same task, in tasks it creates,
+    or in threads started with asyncio.to_thread) share the trace id.
+    """
+    if TRACE_EXPORT == "off":
+        yield NOOP_SPAN
+        return
+
+    parent = _current.get()
+    current = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent else None,
+        attributes=attributes,
+    )
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.attributes["error"] = repr(e)
+        raise
+    finally:
+        current.duration_ms = round((time.perf_counter() - current.start) * 1000, 3)
+        _current.reset(token)
+        _buffer.add(current)
+
+def traced(name: str, **attributes):
+    """Decorator wrapping every call in a span (sync or async functions)."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def link_post(post_id: int, trace_ids: list[str] | None = None):
+    """Attach the current trace (and any other contributing traces) to a post's waterfall."""
+    if TRACE_EXPORT == "off":
+        return
+    for trace_id in {current_trace_id(), *(trace_ids or [])}:
+        if trace_id:
+            _buffer.link(trace_id, post_id)
+
+# -------------------- Waterfall --------------------
+def _load_spans(post_id: int) -> list[dict]:
+    if TRACE_EXPORT == "jsonl":
+        if not os.path.exists(TRACE_JSONL_PATH):
+            return []
+        with open(TRACE_JSONL_PATH) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        trace_ids = {r["trace_id"] for r in records if r["kind"] == "link" and r["post_id"] == post_id}
+        spans = [r for r in records if r["kind"] == "span" and r["trace_id"] in trace_ids]
+        return sorted(spans, key=lambda s: s["start_time"])
+
+    import db.traces
+    return db.traces.get_post_spans(post_id)
+
+def waterfall(post_id: int) -> dict:
+    """Spans for a post laid out on one timeline, plus the time spent per stage."""
+    flush()
+    spans = _load_spans(post_id)
+    if not spans:
+        return {"post_id": post_id, "traces": [], "total_ms": 0, "stages": {}, "spans": []}
+
+    origin = min(datetime.fromisoformat(s["start_time"]) for s in spans)
+    end = max(datetime.fromisoformat(s["end_time"]) for s in spans)
+    by_id = {s["span_id"]: s for s in spans}
+
+    stages: dict[str, float] = {}
+    for s in spans:
+        s["offset_ms"] = round((datetime.fromisoformat(s["start_time"]) - origin).total_seconds() * 1000, 3)
+        depth, parent = 0, by_id.get(s["parent_id"])
+        while parent:
+            depth, parent = depth + 1, by_id.get(parent["parent_id"])
+        s["depth"] = depth
+        stages[s["name"]] = round(stages.get(s["name"], 0) + (s["duration_ms"] or 0), 3)
+
+    return {
+        "post_id": post_id,
+        "traces": sorted({s["trace_id"] for s in spans}),
+        "total_ms": round((end - origin).total_seconds() * 1000, 3),
+        "stages": dict(sorted(stages.items(), key=lambda kv: -kv[1])),
+        "spans": spans,
+    }
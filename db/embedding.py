@@ -2,14 +2,38 @@ import os
 import json
 import datetime
 import struct
+import threading
+import core.metrics
+import core.tracing
 from db.schema import get_connection
-from fastembed import TextEmbedding
 
 # Suppress Hugging Face token warning
 os.environ["HF_HUB_DISABLE_IMPLICIT_TOKEN"] = "1"
 
-# Initialize the embedding model (downloads on first use)
-embedding_model = TextEmbedding(model_name="sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# One process-wide model, loaded (and downloaded if needed) on first use
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
+
+def get_embedding_model():
+    global _embedding_model
+    with _embedding_model_lock:
+        if _embedding_model is None:
+            from fastembed import TextEmbedding
+            _embedding_model = TextEmbedding(model_name=EMBEDDING_MODEL_NAME)
+        return _embedding_model
+
+# Embedding throughput: rate(embedding_texts_total) / rate(embedding_seconds_sum)
+embedding_texts = core.metrics.counter("embedding_texts_total", "Texts embedded", ("source",))
+embedding_seconds = core.metrics.histogram("embedding_seconds", "Time per embedding call", ("source",))
+
+def embed_texts(texts: list[str], source: str) -> list:
+    """Embed a batch of texts with the shared model, recording throughput under `source`."""
+    with core.tracing.span("embedding", source=source, texts=len(texts)), embedding_seconds.time(source=source):
+        vectors = list(get_embedding_model().embed(texts))
+    embedding_texts.inc(len(texts), source=source)
+    return vectors
 
 def serialize_embedding(embedding: list[float]) -> bytes:
     """Serialize embedding to binary format for sqlite-vec."""
@@ -55,13 +79,17 @@ def save_embedding(source_type: str, content: str, embedding: list[float],
     conn.commit()
     return rowid
 
-def generate_embeddings_batch(chunks: list[dict]):
-    """Generate embeddings for multiple texts in a batch (more efficient)."""
+def generate_embeddings_batch(chunks: list[dict], embeddings: list | None = None):
+    """
+    Generate embeddings for multiple texts in a batch (more efficient).
+    Pass `embeddings` when they were already computed for these chunks.
+    """
     if not chunks:
         return
 
-    texts = [c["content"] for c in chunks]
-    embeddings = list(embedding_model.embed(texts))
+    if embeddings is None:
+        texts = [c["content"] for c in chunks]
+        embeddings = embed_texts(texts, "batch")
 
     for chunk, emb in zip(chunks, embeddings):
         save_embedding(
@@ -1,21 +1,24 @@
 import os
 import sqlite3
-import datetime
+from datetime import datetime
 from core.models import Feedback
 from db.schema import get_connection
+from db.pagination import keyset_page
 
 def create_feedback(post_id, decision, reason, content):
     conn = get_connection()
     cur = conn.cursor()
 
+    now = datetime.utcnow().isoformat()
     cur.execute("""
-    INSERT INTO feedback (post_id, decision, reason, created_at)
-    VALUES (?, ?, ?, ?)
+    INSERT INTO feedback (post_id, decision, reason, created_at, content)
+    VALUES (?, ?, ?, ?, ?)
     """, (
         post_id,
         decision,
         reason,
-        datetime.utcnow().isoformat()
+        now,
+        content
     ))
 
     conn.commit()
@@ -27,26 +30,56 @@ def create_feedback(post_id, decision, reason, content):
         post_id=post_id,
         decision=decision,
         reason=reason,
-        created_at=datetime.utcnow().isoformat(),
+        created_at=now,
         content=content
     )
 
-def get_all_feedback(limit: int = 50, offset: int = 0) -> list[Feedback]:
-    """Return a list of Feedback objects, newest first, including content."""
+def create_feedback_batch(records: list[dict]) -> int:
+    """
+    Insert many feedback rows in a single transaction.
+
+    Each record has the keys post_id, decision, reason and content.
+    Returns the number of rows inserted.
+    """
+    if not records:
+        return 0
+
     conn = get_connection()
     cur = conn.cursor()
 
-    cur.execute("""
-    SELECT id, post_id, decision, reason, created_at, content
-    FROM feedback
-    ORDER BY created_at DESC
-    LIMIT ? OFFSET ?
-    """, (limit, offset))
+    now = datetime.utcnow().isoformat()
+    cur.executemany("""
+    INSERT INTO feedback (post_id, decision, reason, created_at, content)
+    VALUES (?, ?, ?, ?, ?)
+    """, [
+        (r["post_id"], r["decision"], r.get("reason"), now, r.get("content"))
+        for r in records
+    ])
 
-    rows = cur.fetchall()
+    conn.commit()
     conn.close()
+    return len(records)
 
-    return [Feedback(*row) for row in rows]
+def list_feedback(limit: int = 50, cursor: str | None = None, offset: int = 0,
+                  decision: str | None = None, post_id: int | None = None) -> tuple[list[Feedback], str | None]:
+    """Newest feedback first with keyset pagination, like db.posts.list_posts."""
+    conn = get_connection()
+    cur = conn.cursor()
+
+    rows, next_cursor = keyset_page(
+        cur,
+        "SELECT id, post_id, decision, reason, created_at, content, created_at, id FROM feedback",
+        {"decision": decision, "post_id": post_id},
+        limit, cursor, offset,
+    )
+    conn.close()
+
+    return [Feedback(*row[:6]) for row in rows], next_cursor
+
+def get_all_feedback(limit: int = 50, offset: int = 0) -> list[Feedback]:
+    """Return a list of Feedback objects, newest first, including content."""
+    feedback, _ = list_feedback(limit, offset=offset)
+    return feedback
 
 
 def get_feedback(post_id: int) -> Feedback | None:
@@ -66,3 +99,30 @@ def get_feedback(post_id: int) -> Feedback | None:
     conn.close()
 
     return Feedback(*row) if row else None
+
+def get_decision_history(limit: int = 1000) -> list[dict]:
+    """
+    Return the most recent human decisions with the content that was reviewed.
+
+    Automatic policy decisions are excluded so they don't reinforce themselves.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+
+    cur.execute("""
+    SELECT f.post_id, f.decision, COALESCE(f.content, p.original_content)
+    FROM feedback f
+    LEFT JOIN posts p ON p.id = f.post_id
+    WHERE f.decision IN ('approve', 'reject', 'edit')
+      AND COALESCE(f.content, p.original_content) IS NOT NULL
+    ORDER BY f.created_at DESC
+    LIMIT ?
+    """, (limit,))
+
+    rows = cur.fetchall()
+    conn.close()
+
+    return [
+        {"post_id": row[0], "decision": row[1], "content": row[2]}
+        for row in rows
+    ]
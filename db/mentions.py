@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+from db.schema import get_connection
+
+def set_account_rules(rules: dict[str, str]):
+    """Upsert allow/deny rules, e.g. {"spam@example.social": "deny"}."""
+    if not rules:
+        return
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.executemany("""
+    INSERT INTO account_rules (account, rule) VALUES (?, ?)
+    ON CONFLICT(account) DO UPDATE SET rule = excluded.rule
+    """, [(account.lower(), rule) for account, rule in rules.items()])
+    conn.commit()
+    conn.close()
+
+def get_mention_context(notification_id: str, account: str, conversation_id: str, content_hash: str,
+                        status_id: str, account_window: float, dedupe_window: float) -> dict:
+    """
+    Everything the mention filter needs, in one connection; each lookup is an
+    index seek (see the mention_log indexes in db.schema.init_db).
+    `previous` is the logged decision when this notification was already filtered.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    now = datetime.utcnow()
+
+    cur.execute(
+        "SELECT accepted, reason FROM mention_log WHERE notification_id = ? ORDER BY id LIMIT 1",
+        (int(notification_id),)
+    )
+    row = cur.fetchone()
+    previous = {"accepted": bool(row[0]), "reason": row[1]} if row else None
+
+    cur.execute("SELECT rule FROM account_rules WHERE account = ?", (account.lower(),))
+    row = cur.fetchone()
+    rule = row[0] if row else None
+
+    cur.execute("""
+    SELECT COUNT(*) FROM mention_log
+    WHERE account = ? AND created_at >= ? AND accepted = 1
+    """, (account, (now - timedelta(seconds=account_window)).isoformat()))
+    account_count = cur.fetchone()[0]
+
+    cur.execute("""
+    SELECT COUNT(*) FROM mention_log
+    WHERE conversation_id = ? AND accepted = 1
+    """, (conversation_id,))
+    thread_count = cur.fetchone()[0]
+
+    cur.execute("""
+    SELECT 1 FROM mention_log
+    WHERE account = ? AND content_hash = ? AND created_at >= ? AND accepted = 1
+    LIMIT 1
+    """, (account, content_hash, (now - timedelta(seconds=dedupe_window)).isoformat()))
+    duplicate = cur.fetchone() is not None
+
+    cur.execute("""
+    SELECT 1 FROM posts
+    WHERE json_extract(metadata, '$.parent_status_id') = ? AND status != 'rejected'
+    LIMIT 1
+    """, (status_id,))
+    replied = cur.fetchone() is not None
+
+    conn.close()
+
+    return {
+        "previous": previous,
+        "rule": rule,
+        "account_count": account_count,
+        "thread_count": thread_count,
+        "duplicate": duplicate,
+        "replied": replied,
+    }
+
+def record_mention(notification_id: str, account: str, conversation_id: str, content_hash: str,
+                   reason: str | None, retention_days: int = 30):
+    """Log a filter decision (reason is None when the mention was accepted)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    now = datetime.utcnow()
+
+    cur.execute("""
+    INSERT INTO mention_log (notification_id, account, conversation_id, content_hash, accepted, reason, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (int(notification_id), account, conversation_id, content_hash, int(reason is None), reason, now.isoformat()))
+
+    # Rejected rows are only kept for inspection
+    cur.execute(
+        "DELETE FROM mention_log WHERE created_at < ? AND accepted = 0",
+        ((now - timedelta(days=retention_days)).isoformat(),)
+    )
+
+    conn.commit()
+    conn.close()
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+from db.schema import get_connection
+
+def get_processed_ids(notification_ids: list[str]) -> set[str]:
+    """Which of these notifications were already handled."""
+    if not notification_ids:
+        return set()
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    placeholders = ", ".join("?" for _ in notification_ids)
+    cur.execute(
+        f"SELECT notification_id FROM processed_notifications WHERE notification_id IN ({placeholders})",
+        [int(i) for i in notification_ids],
+    )
+    rows = cur.fetchall()
+    conn.close()
+
+    return {str(row[0]) for row in rows}
+
+def checkpoint(records: list[dict], cursor_key: str, cursor: str | None, retention_days: int = 30):
+    """
+    Record handled notifications and advance the ingestion cursor in one transaction.
+
+    Each record has the keys id, type and outcome. The cursor is only moved
+    forward, and ledger rows older than `retention_days` are pruned.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+
+    now = datetime.utcnow()
+    cur.executemany("""
+    INSERT OR IGNORE INTO processed_notifications (notification_id, type, outcome, processed_at)
+    VALUES (?, ?, ?, ?)
+    """, [
+        (int(r["id"]), r.get("type"), r.get("outcome"), now.isoformat())
+        for r in records
+    ])
+
+    if cursor is not None:
+        cur.execute("""
+        INSERT INTO state (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        WHERE CAST(excluded.value AS INTEGER) > CAST(state.value AS INTEGER)
+        """, (cursor_key, cursor))
+
+    cur.execute(
+        "DELETE FROM processed_notifications WHERE processed_at < ?",
+        ((now - timedelta(days=retention_days)).isoformat(),)
+    )
+
+    conn.commit()
+    conn.close()
@@ -1,9 +1,13 @@
 import os
 import re
+import difflib
 import hashlib
 import requests
+import numpy as np
 from db.schema import get_connection
-from db.embedding import generate_embeddings_batch
+import core.metrics
+import core.tracing
+from db.embedding import embed_texts, serialize_embedding, generate_embeddings_batch
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -16,7 +20,13 @@ NOTION_VERSION = "2022-06-28"
 API_BASE = "https://api.notion.com/v1"
 
 # Global variables
-DIFF_THRESHOLD = 0.25
+# Minimum embedding distance between old and new chunk content for an update to trigger a post
+DIFF_THRESHOLD = float(os.getenv("NOTION_DIFF_THRESHOLD", "0.25"))
+
+# -------------------- Metrics --------------------
+sync_seconds = core.metrics.histogram("notion_sync_seconds", "Duration of a full Notion sync")
+chunks_changed = core.metrics.counter("notion_chunks_changed_total", "New or updated Notion chunks", ("kind",))
+triggers_created = core.metrics.counter("notion_triggers_created_total", "Notion triggers inserted")
 
 # -------------------- Hash --------------------
 def content_hash(text: str) -> str:
@@ -171,20 +181,55 @@ def chunk_all_pages(all_pages):
 
     return all_chunks
 
-def sync_notion():
-    pages = search_all_pages()
-    chunks = chunk_all_pages(pages)
+# -------------------- Change scoring --------------------
+def changed_text(old: str, new: str) -> str:
+    """The lines of `new` that were added or rewritten relative to `old`."""
+    old_lines, new_lines = old.splitlines(), new.splitlines()
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+
+    changed = []
+    for tag, _, _, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "insert"):
+            changed.extend(new_lines[j1:j2])
+    return "\n".join(line for line in changed if line.strip())
+
+def cosine_distance(a: np.ndarray, b: np.ndarray) -> float:
+    denom = max(float(np.linalg.norm(a) * np.linalg.norm(b)), 1e-12)
+    return 1.0 - float(np.dot(a, b)) / denom
+
+@core.metrics.timed(sync_seconds)
+def sync_notion() -> int:
+    with core.tracing.span("notion.sync") as span:
+        new_triggers = _sync_notion()
+        span.set(triggers=new_triggers)
+    return new_triggers
+
+def _sync_notion() -> int:
+    """
+    Sync Notion into notion_chunks and embeddings; returns the number of triggers inserted.
+
+    New chunks always trigger (score 1.0). Updated chunks are scored by the
+    cosine distance between the old and new embeddings and trigger with
+    their changed lines only if the score reaches DIFF_THRESHOLD.
+    """
+    with core.tracing.span("notion.fetch") as span:
+        pages = search_all_pages()
+        span.set(pages=len(pages))
+    with core.tracing.span("notion.chunk") as span:
+        chunks = chunk_all_pages(pages)
+        span.set(chunks=len(chunks))
 
     conn = get_connection()
     cur = conn.cursor()
 
     # Filter new or updated chunks
     to_embed = []
+    previous = {}  # source_id -> last content, for updated chunks
 
     for chunk in chunks:
         sid = chunk["source_id"]
-        content = chunk["content"]
-        new_hash = content_hash(content)
+        new_hash = content_hash(chunk["content"])
+        chunk["hash"] = new_hash
 
         cur.execute(
             "SELECT content_hash, last_content FROM notion_chunks WHERE source_id = ?",
@@ -192,33 +237,62 @@ def sync_notion():
         )
         row = cur.fetchone()
 
-        if row is None:
-            # New chunk
+        if row is not None:
+            old_hash, old_content = row
+            if old_hash == new_hash:
+                continue  # No change
+            previous[sid] = old_content
+
+        to_embed.append(chunk)
+
+    if not to_embed:
+        conn.close()
+        return 0
+
+    # One embedding pass for new content and the old content it replaces
+    updated = [c for c in to_embed if c["source_id"] in previous]
+    vectors = embed_texts(
+        [c["content"] for c in to_embed] + [previous[c["source_id"]] for c in updated], "notion"
+    )
+    chunks_changed.inc(len(to_embed) - len(updated), kind="new")
+    chunks_changed.inc(len(updated), kind="updated")
+    new_vectors = dict(zip((c["source_id"] for c in to_embed), vectors))
+    old_vectors = dict(zip((c["source_id"] for c in updated), vectors[len(to_embed):]))
+
+    new_triggers = 0
+    for chunk in to_embed:
+        sid = chunk["source_id"]
+        content = chunk["content"]
+
+        if sid in previous:
+            # Update canonical record
             cur.execute(
-                "INSERT INTO notion_chunks (source_id, content_hash, last_content) VALUES (?, ?, ?)",
-                (sid, new_hash, content)
+                "UPDATE notion_chunks SET content_hash=?, last_content=?, updated_at=CURRENT_TIMESTAMP WHERE source_id=?",
+                (chunk["hash"], content, sid)
             )
-
+            score = cosine_distance(old_vectors[sid], new_vectors[sid])
+            diff = changed_text(previous[sid], content)
+        else:
+            # New chunk
             cur.execute(
-                "INSERT INTO notion_triggers (source_id, diff, change_score) VALUES (?, ?, ?)",
-                (sid, content, 1.0)
+                "INSERT INTO notion_chunks (source_id, content_hash, last_content) VALUES (?, ?, ?)",
+                (sid, chunk["hash"], content)
             )
+            score = 1.0
+            diff = content
 
-            to_embed.append(chunk)
-        else:
-            old_hash = row
-            if old_hash == new_hash:
-                continue  # No change
-            # Update canonical record
+        if score >= DIFF_THRESHOLD and diff:
             cur.execute(
-                "UPDATE notion_chunks SET content_hash=?, last_content=?, updated_at=CURRENT_TIMESTAMP WHERE source_id=?",
-                (new_hash, content, sid)
+                "INSERT INTO notion_triggers (source_id, diff, change_score, embedding, trace_id) VALUES (?, ?, ?, ?, ?)",
+                (sid, diff, score, serialize_embedding(new_vectors[sid].tolist()), core.tracing.current_trace_id())
             )
-            to_embed.append(chunk)
+            new_triggers += 1
 
     conn.commit()
     conn.close()
+    triggers_created.inc(new_triggers)
+
+    # Save embeddings for all new/updated chunks (already computed above)
+    generate_embeddings_batch(to_embed, [new_vectors[c["source_id"]] for c in to_embed])
 
-    # Generate and save embeddings for all new/updated chunks
-    if to_embed:
-        generate_embeddings_batch(to_embed)
+    return new_triggers
@@ -0,0 +1,50 @@
+import base64
+
+# -------------------- Keyset cursors --------------------
+def encode_cursor(created_at: str, row_id: int) -> str:
+    """Opaque cursor pointing just past the row (created_at, id)."""
+    raw = f"{created_at}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.rsplit("|", 1)
+        return created_at, int(row_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def keyset_page(cur, select: str, filters: dict, limit: int, cursor: str | None, offset: int = 0):
+    """
+    Run `select` (everything up to WHERE) newest first, with equality `filters`
+    pushed into SQL and keyset pagination on (created_at, id).
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    `select` must expose created_at and id as the last two columns.
+    """
+    clauses = []
+    params = []
+    for column, value in filters.items():
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+
+    if cursor:
+        clauses.append("(created_at, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cur.execute(f"""
+        {select}
+        {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ? OFFSET ?
+    """, (*params, limit + 1, offset))
+    rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+    return rows, next_cursor
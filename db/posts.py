@@ -1,9 +1,56 @@
 import os
-import sqlite3
+import re
+import json
+import dataclasses
 from datetime import datetime, timezone
+from typing import Callable
 from core.models import PostDraft, Post
 from db.schema import get_connection
+from db.pagination import keyset_page
 
+# -------------------- Row mapping --------------------
+# Columns that map onto Post fields; anything else in the row is ignored
+POST_FIELDS = {f.name for f in dataclasses.fields(Post)} - {"image"}
+METADATA_PATH = re.compile(r"^\$(\.[A-Za-z_][A-Za-z0-9_]*)+$")
+
+def _decode_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+def _decode_json(value):
+    return json.loads(value) if value else {}
+
+POST_DECODERS = {
+    "created_at": _decode_datetime,
+    "posted_at": _decode_datetime,
+    "metadata": _decode_json,
+}
+
+_post_mappers: dict[tuple, Callable[[tuple], Post]] = {}
+
+def post_mapper(description) -> Callable[[tuple], Post]:
+    """
+    Row -> Post mapper for a cursor's column layout, built once per layout.
+    Columns are matched by name, so schema column order doesn't matter.
+    """
+    columns = tuple(d[0] for d in description)
+    mapper = _post_mappers.get(columns)
+    if mapper is None:
+        plan = [
+            (name, index, POST_DECODERS.get(name))
+            for index, name in enumerate(columns)
+            if name in POST_FIELDS
+        ]
+
+        def mapper(row: tuple) -> Post:
+            return Post(**{
+                name: decode(row[index]) if decode else row[index]
+                for name, index, decode in plan
+            })
+
+        _post_mappers[columns] = mapper
+    return mapper
+
+# -------------------- Posts --------------------
 def create_post(draft: PostDraft, status: str = "generated") -> int:
     conn = get_connection()
     cur = conn.cursor()
@@ -12,8 +59,8 @@ def create_post(draft: PostDraft, status: str = "generated") -> int:
 
     cur.execute("""
         INSERT INTO posts (
-            platform, type, original_content, image_path, parent_post_id, status, created_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            platform, type, original_content, image_path, parent_post_id, status, created_at, image_hash, metadata
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (
         draft.platform,
         draft.type,
@@ -21,7 +68,9 @@ def create_post(draft: PostDraft, status: str = "generated") -> int:
         draft.image_path,
         draft.parent_post_id,
         status,
-        now
+        now,
+        draft.image_hash,
+        json.dumps(draft.metadata) if draft.metadata else None
     ))
 
     conn.commit()
@@ -29,57 +78,65 @@ def create_post(draft: PostDraft, status: str = "generated") -> int:
     conn.close()
     return post_id
 
-def get_post(post_id: int):
+def get_post(post_id: int) -> Post | None:
     conn = get_connection()
     cur = conn.cursor()
 
     cur.execute("SELECT * FROM posts WHERE id = ?", (post_id,))
     row = cur.fetchone()
+    mapper = post_mapper(cur.description)
     conn.close()
 
-    if not row:
-        return None
+    return mapper(row) if row else None
+
+def list_posts(limit: int = 50, cursor: str | None = None, offset: int = 0,
+               status: str | None = None, platform: str | None = None,
+               post_type: str | None = None) -> tuple[list[Post], str | None]:
+    """
+    Newest posts first, filtered in SQL. Pass the returned cursor back to get the
+    next page; it seeks on the (created_at, id) index instead of skipping rows.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
 
-    # Map SQLite row to a dictionary
-    keys = ["id", "type", "platform", "original_content", "final_content",
-            "image_path", "parent_post_id", "status", "created_at", "posted_at", "metadata",  "img_url"]
+    rows, next_cursor = keyset_page(
+        cur,
+        "SELECT *, created_at AS _created_at, id AS _id FROM posts",
+        {"status": status, "platform": platform, "type": post_type},
+        limit, cursor, offset,
+    )
+    mapper = post_mapper(cur.description)
+    conn.close()
 
-    row_dict = dict(zip(keys, row))
-    return Post(**row_dict)
+    return [mapper(row) for row in rows], next_cursor
 
-def get_all_posts(limit: int = 10, offset: int = 0) -> list[Post]:
-    conn = get_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    query = """
-        SELECT *
-        FROM posts
-        ORDER BY created_at DESC
-        LIMIT ? OFFSET ?
+def find_posts_by_metadata(path: str, value, limit: int = 50) -> list[Post]:
     """
-    cursor.execute(query, (limit, offset))
-    rows = cursor.fetchall()
-
-    posts = []
-    for row in rows:
-        post = Post(
-            id=row["id"],
-            platform=row["platform"],
-            type=row["type"],
-            original_content=row["original_content"],
-            final_content=row["final_content"],
-            image_path=row["image_path"],
-            parent_post_id=row["parent_post_id"],
-            status=row["status"],
-            created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None,
-            posted_at=datetime.fromisoformat(row["posted_at"]) if row["posted_at"] else None,
-            metadata=eval(row["metadata"]) if row["metadata"] else {},
-            img_url=row["img_url"]
-        )
-        posts.append(post)
+    Posts whose metadata JSON has `value` at `path` (e.g. "$.parent_status_id").
+
+    The path is inlined into the SQL so that queries on an indexed path
+    (see db.schema.init_db) can use the expression index.
+    """
+    if not METADATA_PATH.match(path):
+        raise ValueError(f"Invalid metadata path: {path!r}")
+
+    conn = get_connection()
+    cur = conn.cursor()
 
+    cur.execute(f"""
+        SELECT * FROM posts
+        WHERE json_extract(metadata, '{path}') = ?
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """, (value, limit))
+    rows = cur.fetchall()
+    mapper = post_mapper(cur.description)
     conn.close()
+
+    return [mapper(row) for row in rows]
+
+def get_all_posts(limit: int = 10, offset: int = 0) -> list[Post]:
+    posts, _ = list_posts(limit, offset=offset)
     return posts
 
 def get_parent_text(post: Post | PostDraft) -> str | None:
@@ -114,6 +171,39 @@ def update_status(post_id: int, status: str):
     conn.commit()
     conn.close()
 
+def update_statuses(updates: list[tuple[int, str]]):
+    """Apply many (post_id, status) updates in a single transaction."""
+    if not updates:
+        return
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    now = datetime.now(timezone.utc).isoformat()
+
+    cur.executemany("""
+        UPDATE posts
+        SET status = ?, decided_at = ?
+        WHERE id = ?
+    """, [(status, now, post_id) for post_id, status in updates])
+
+    conn.commit()
+    conn.close()
+
+def update_final_contents(updates: list[tuple[int, str]]):
+    """Store operator-edited text for many (post_id, final_content) pairs."""
+    if not updates:
+        return
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.executemany(
+        "UPDATE posts SET final_content = ? WHERE id = ?",
+        [(content, post_id) for post_id, content in updates]
+    )
+    conn.commit()
+    conn.close()
+
 def update_post_img_url(post_id: int, img_url: str):
     conn = get_connection()
     cur = conn.cursor()
@@ -125,12 +215,42 @@ def update_post_img_url(post_id: int, img_url: str):
     conn.close()
 
 def update_post_posted_at(post_id: int, posted_at: datetime | None = None):
-    posted_at = posted_at or datetime.now(timezone.utc).isoformat()
+    # Stored as an ISO string like every other timestamp, never via sqlite3's datetime adapter
+    posted_at = (posted_at or datetime.now(timezone.utc)).isoformat()
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
         "UPDATE posts SET posted_at = ? WHERE id = ?",
-        (posted_at.isoformat(), post_id)
+        (posted_at, post_id)
+    )
+    conn.commit()
+    conn.close()
+
+def update_post_mastodon_id(post_id: int, mastodon_status_id: str):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE posts SET mastodon_status_id = ? WHERE id = ?",
+        (mastodon_status_id, post_id)
+    )
+    conn.commit()
+    conn.close()
+
+def get_posted_images() -> list[tuple[int, str, str | None]]:
+    """Return (id, img_url, image_hash) for every post with an archived image."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id, img_url, image_hash FROM posts WHERE img_url IS NOT NULL")
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+def update_post_image_hash(post_id: int, image_hash: str):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE posts SET image_hash = ? WHERE id = ?",
+        (image_hash, post_id)
     )
     conn.commit()
     conn.close()
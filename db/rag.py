@@ -1,6 +1,8 @@
 import os
 import json
 import sqlite3
+import core.metrics
+import core.tracing
 from db.embedding import serialize_embedding
 from db.schema import get_connection
 
@@ -126,6 +128,10 @@ def get_metadata_by_ids(ids: list[int]) -> dict[int, dict]:
         }
     return results
 
+rag_query_seconds = core.metrics.histogram("rag_query_seconds", "Hybrid (BM25 + vector) search latency")
+
+@core.metrics.timed(rag_query_seconds)
+@core.tracing.traced("rag.query")
 def hybrid_search(
     query: str,
     query_embedding: list[float],
@@ -1,6 +1,5 @@
 import os
 import sqlite3
-import sqlite_vec
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -10,14 +9,25 @@ DB_FILE = os.getenv("DB_FILE")
 def get_connection():
     return sqlite3.connect(DB_FILE)
 
-def init_db():
+def add_column_if_missing(cur, table: str, column: str, definition: str):
+    """Add a column to an existing table (CREATE TABLE IF NOT EXISTS won't)."""
+    cur.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cur.fetchall()}:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def init_db(vector: bool = True):
+    """Create or migrate every table. vector=False skips the sqlite-vec table (e.g. in tests)."""
     conn = get_connection()
     conn.row_factory = sqlite3.Row
 
-    # Load sqlite-vec extension
-    conn.enable_load_extension(True)
-    sqlite_vec.load(conn)
-    conn.enable_load_extension(False)
+    if vector:
+        # Load sqlite-vec extension on this connection, to create vec_embeddings. Imported
+        # here to keep `import db.schema` cheap; any other connection that reads or writes
+        # vec_embeddings has to load the extension itself
+        import sqlite_vec
+        conn.enable_load_extension(True)
+        sqlite_vec.load(conn)
+        conn.enable_load_extension(False)
 
     cur = conn.cursor()
 
@@ -35,9 +45,15 @@ def init_db():
         created_at TEXT,
         posted_at TEXT,
         metadata TEXT,
-        img_url TEXT
+        img_url TEXT,
+        decided_at TEXT,
+        mastodon_status_id TEXT,
+        image_hash TEXT
     )
     """)
+    add_column_if_missing(cur, "posts", "decided_at", "TEXT")
+    add_column_if_missing(cur, "posts", "mastodon_status_id", "TEXT")
+    add_column_if_missing(cur, "posts", "image_hash", "TEXT")
 
     # Feedback table
     cur.execute("""
@@ -46,9 +62,25 @@ def init_db():
         post_id INTEGER,
         decision TEXT,
         reason TEXT,
-        created_at TEXT
+        created_at TEXT,
+        content TEXT
     )
     """)
+    add_column_if_missing(cur, "feedback", "content", "TEXT")
+
+    # Listing indexes: newest-first keyset pagination, optionally filtered
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_created ON posts(created_at, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_status_created ON posts(status, created_at, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_platform_created ON posts(platform, created_at, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_type_created ON posts(type, created_at, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_parent ON posts(parent_post_id)")
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_posts_meta_parent_status
+    ON posts(json_extract(metadata, '$.parent_status_id'))
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_feedback_created ON feedback(created_at, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_feedback_post ON feedback(post_id, created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_feedback_decision_created ON feedback(decision, created_at, id)")
 
     # Metadata table (stores content and metadata, linked to vectors by rowid)
     cur.execute("""
@@ -63,11 +95,12 @@ def init_db():
     """)
 
     # Vector table using sqlite-vec (384 dimensions for MiniLM-L6-v2)
-    cur.execute("""
-    CREATE VIRTUAL TABLE IF NOT EXISTS vec_embeddings USING vec0(
-        embedding float[384] distance_metric=cosine
-    )
-    """)
+    if vector:
+        cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS vec_embeddings USING vec0(
+            embedding float[384] distance_metric=cosine
+        )
+        """)
 
     # FTS5 virtual table for BM25 keyword search
     cur.execute("""
@@ -103,6 +136,70 @@ def init_db():
     )
     """)
 
+    # Notifications that have been handled (idempotency ledger for ingestion)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS processed_notifications (
+        notification_id INTEGER PRIMARY KEY,
+        type TEXT,
+        outcome TEXT,
+        processed_at TEXT
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_processed_notifications_at ON processed_notifications(processed_at)")
+
+    # Mention filter decisions (thread caps, dedupe window, per-account rate limits)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS mention_log (
+        id INTEGER PRIMARY KEY,
+        notification_id INTEGER,
+        account TEXT,
+        conversation_id TEXT,
+        content_hash TEXT,
+        accepted INTEGER,
+        reason TEXT,
+        created_at TEXT
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_mention_log_account ON mention_log(account, created_at) WHERE accepted = 1")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_mention_log_conversation ON mention_log(conversation_id) WHERE accepted = 1")
+    # Duplicates are per account: different people may well send the same "thanks!"
+    cur.execute("DROP INDEX IF EXISTS idx_mention_log_hash")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_mention_log_account_hash ON mention_log(account, content_hash, created_at) WHERE accepted = 1")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_mention_log_created ON mention_log(created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_mention_log_notification ON mention_log(notification_id)")
+
+    # Per-account allow/deny rules for mentions
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS account_rules (
+        account TEXT PRIMARY KEY,
+        rule TEXT NOT NULL
+    )
+    """)
+
+    # Tracing: finished spans and which traces contributed to which post
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS spans (
+        span_id TEXT PRIMARY KEY,
+        trace_id TEXT NOT NULL,
+        parent_id TEXT,
+        name TEXT,
+        start_time TEXT,
+        end_time TEXT,
+        duration_ms REAL,
+        status TEXT,
+        attributes TEXT
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_spans_trace ON spans(trace_id, start_time)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_spans_start ON spans(start_time)")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS trace_posts (
+        trace_id TEXT NOT NULL,
+        post_id INTEGER NOT NULL,
+        PRIMARY KEY (post_id, trace_id)
+    )
+    """)
+
     # Notion tabes
     cur.execute("""
     CREATE TABLE IF NOT EXISTS notion_chunks (
@@ -120,9 +217,14 @@ def init_db():
         diff TEXT,
         change_score REAL,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        used INTEGER DEFAULT 0
+        used INTEGER DEFAULT 0,
+        embedding BLOB,
+        trace_id TEXT
     )
     """)
+    add_column_if_missing(cur, "notion_triggers", "embedding", "BLOB")
+    add_column_if_missing(cur, "notion_triggers", "trace_id", "TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notion_triggers_used_created ON notion_triggers(used, created_at, id)")
 
     conn.commit()
     conn.close()
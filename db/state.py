@@ -7,6 +7,7 @@ def get(key: str):
     cur = conn.cursor()
     cur.execute("SELECT value FROM state WHERE key = ?", (key,))
     row = cur.fetchone()
+    conn.close()
     return row[0] if row else None
 
 def set(key: str, value: str):
@@ -17,3 +18,4 @@ def set(key: str, value: str):
         (key, value)
     )
     conn.commit()
+    conn.close()
@@ -0,0 +1,68 @@
+import json
+from datetime import datetime, timedelta
+from db.schema import get_connection
+
+def save_spans(spans: list[dict], links: list[tuple[str, int]]):
+    """Write finished spans and (trace_id, post_id) links in one transaction."""
+    if not spans and not links:
+        return
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.executemany("""
+    INSERT OR IGNORE INTO spans
+        (span_id, trace_id, parent_id, name, start_time, end_time, duration_ms, status, attributes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (
+            s["span_id"], s["trace_id"], s["parent_id"], s["name"],
+            s["start_time"], s["end_time"], s["duration_ms"], s["status"],
+            json.dumps(s["attributes"], default=str),
+        )
+        for s in spans
+    ])
+    cur.executemany(
+        "INSERT OR IGNORE INTO trace_posts (trace_id, post_id) VALUES (?, ?)",
+        links
+    )
+    conn.commit()
+    conn.close()
+
+def get_post_spans(post_id: int) -> list[dict]:
+    """Every span of every trace linked to the post, in start order."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("""
+    SELECT s.span_id, s.trace_id, s.parent_id, s.name, s.start_time, s.end_time,
+           s.duration_ms, s.status, s.attributes
+    FROM trace_posts t
+    JOIN spans s ON s.trace_id = t.trace_id
+    WHERE t.post_id = ?
+    ORDER BY s.start_time, s.span_id
+    """, (post_id,))
+    rows = cur.fetchall()
+    conn.close()
+
+    return [
+        {
+            "span_id": row[0],
+            "trace_id": row[1],
+            "parent_id": row[2],
+            "name": row[3],
+            "start_time": row[4],
+            "end_time": row[5],
+            "duration_ms": row[6],
+            "status": row[7],
+            "attributes": json.loads(row[8]) if row[8] else {},
+        }
+        for row in rows
+    ]
+
+def prune_spans(retention_days: int):
+    conn = get_connection()
+    cur = conn.cursor()
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+    cur.execute("DELETE FROM spans WHERE start_time < ?", (cutoff,))
+    cur.execute("DELETE FROM trace_posts WHERE trace_id NOT IN (SELECT trace_id FROM spans)")
+    conn.commit()
+    conn.close()
@@ -1,17 +1,20 @@
 from db.schema import get_connection
 
-def get_pending_triggers():
+def get_pending_triggers(limit: int = 50):
     """
-    Fetch all notion_triggers that haven't been processed yet.
+    Fetch the oldest notion_triggers that haven't been processed yet, at most `limit`.
     """
     conn = get_connection()
     cur = conn.cursor()
 
+    # Served by idx_notion_triggers_used_created
     cur.execute("""
-        SELECT id, source_id, diff, change_score, created_at
+        SELECT id, source_id, diff, change_score, created_at, embedding, trace_id
         FROM notion_triggers
-        ORDER BY created_at ASC
-    """)
+        WHERE used = 0
+        ORDER BY created_at ASC, id ASC
+        LIMIT ?
+    """, (limit,))
     rows = cur.fetchall()
     conn.close()
 
@@ -23,12 +26,32 @@ def get_pending_triggers():
             "diff": row[2],
             "score": row[3],
             "created_at": row[4],
+            "embedding": row[5],  # float32 bytes (db.embedding.serialize_embedding) or None
+            "trace_id": row[6],  # the sync that created it
         })
     return triggers
 
-def mark_trigger_processed(trigger_id: int):
+def mark_triggers_processed(trigger_ids: list[int]):
+    """Mark a batch of triggers as used in a single transaction."""
+    if not trigger_ids:
+        return
+
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute("DELETE FROM notion_triggers WHERE id = ?", (trigger_id,))
+    cur.executemany(
+        "UPDATE notion_triggers SET used = 1 WHERE id = ?",
+        [(trigger_id,) for trigger_id in trigger_ids]
+    )
     conn.commit()
     conn.close()
+
+def mark_trigger_processed(trigger_id: int):
+    mark_triggers_processed([trigger_id])
+
+def count_pending_triggers() -> int:
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM notion_triggers WHERE used = 0")
+    count = cur.fetchone()[0]
+    conn.close()
+    return count
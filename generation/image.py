@@ -1,10 +1,13 @@
+import io
 import os
-import replicate
-import uuid
+import asyncio
 import requests
+import db.posts
+import core.tracing
+from PIL import Image as PILImage
 from core.models import PostDraft
-from replicate.exceptions import ReplicateError
-from IPython.display import Image, display
+from core.media import ImageBuffer
+from generation.image_backends import get_image_backend
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,10 +17,15 @@ REPLICATE_USERNAME = "sundai-club"
 FINETUNED_MODEL_NAME = "redbull_suzuka_livery"
 TRIGGER_WORD = "tr1gg3r_w0rd"
 
-os.environ["REPLICATE_API_TOKEN"] = REPLICATE_API_KEY
+if REPLICATE_API_KEY:
+    os.environ["REPLICATE_API_TOKEN"] = REPLICATE_API_KEY
 
 # -------------------- Model Respository --------------------
+# Training helpers import replicate themselves; generation goes through image_backends
 def create_or_get_model():
+    import replicate
+    from replicate.exceptions import ReplicateError
+
     replicate_username = REPLICATE_USERNAME
     finetuned_model_name = FINETUNED_MODEL_NAME
 
@@ -42,6 +50,8 @@ def create_or_get_model():
 
 # -------------------- Training --------------------
 def train_model(model):
+    import replicate
+
     dataset_path = "dataset.zip"
     steps = 1000 # keep the number of steps at 1000
 
@@ -59,6 +69,8 @@ def train_model(model):
     print(f"Training URL: https://replicate.com/p/{training.id}")
 
 def test_model(model):
+    import replicate
+
     latest_version = model.versions.list()[0]
 
     output = replicate.run(
@@ -72,42 +84,222 @@ def test_model(model):
 
     generated_img_url = str(output[0])
     print(f"Generated image URL: {generated_img_url}")
-    display(Image(url=generated_img_url))
 
-# -------------------- Mastodon --------------------
-def generate_image_post():
-    output = replicate.run(
-        "sundai-club/redbull_suzuka_livery:24b0b168263d9b15ce91d2e3eeb44958c770602c408a0c947f9d78b8d1fac737",
-        input={
-            "model": "dev",
-            "prompt": f"{TRIGGER_WORD} on track f1",
-            "go_fast": False,
-            "lora_scale": 1,
-            "megapixels": "1",
-            "num_outputs": 1,
-            "aspect_ratio": "1:1",
-            "output_format": "webp",
-            "guidance_scale": 3,
-            "output_quality": 80,
-            "prompt_strength": 0.8,
-            "extra_lora_scale": 1,
-            "num_inference_steps": 28
-        }
-    )
+# -------------------- Profiles --------------------
+# "fast" uses the schnell model, which only needs a handful of steps
+IMAGE_PROFILES = {
+    "quality": {"model": "dev", "go_fast": False, "num_inference_steps": 28},
+    "fast": {"model": "schnell", "go_fast": True, "num_inference_steps": 4},
+}
+IMAGE_PROFILE = os.getenv("IMAGE_PROFILE", "quality")
+
+# Pre-generated drafts kept ready for /image/generate. Opt-in: a filled pool costs
+# GPU time on every start, whether or not anyone asks for an image
+IMAGE_POOL_SIZE = int(os.getenv("IMAGE_POOL_SIZE", "0"))
+IMAGE_POOL_PROFILE = os.getenv("IMAGE_POOL_PROFILE", IMAGE_PROFILE)
+
+# Predictions one on-demand request may run when all variants are duplicates; each one is paid
+IMAGE_ON_DEMAND_ATTEMPTS = max(1, int(os.getenv("IMAGE_ON_DEMAND_ATTEMPTS", "1")))
+
+# Background refills in a row that may fail or come back all-duplicate before the
+# pool stops until the next request, and the wait between them
+IMAGE_POOL_REFILL_ATTEMPTS = max(1, int(os.getenv("IMAGE_POOL_REFILL_ATTEMPTS", "3")))
+IMAGE_POOL_RETRY_SECONDS = float(os.getenv("IMAGE_POOL_RETRY_SECONDS", "60"))
+
+# Outputs per prediction: one queue wait and cold start shared by several images
+IMAGE_BATCH_SIZE = int(os.getenv("IMAGE_BATCH_SIZE", "4"))
+# Candidates within this many differing hash bits of a posted image (or of each other) are duplicates
+DUPLICATE_HASH_DISTANCE = int(os.getenv("DUPLICATE_HASH_DISTANCE", "10"))
+
+def build_input(profile: str, num_outputs: int = 1) -> dict:
+    if profile not in IMAGE_PROFILES:
+        raise ValueError(f"Unknown image profile: {profile}")
+
+    return {
+        "prompt": f"{TRIGGER_WORD} on track f1",
+        "lora_scale": 1,
+        "megapixels": "1",
+        "num_outputs": num_outputs,
+        "aspect_ratio": "1:1",
+        "output_format": "webp",
+        "guidance_scale": 3,
+        "output_quality": 80,
+        "prompt_strength": 0.8,
+        "extra_lora_scale": 1,
+        **IMAGE_PROFILES[profile],
+    }
+
+class DuplicateImageError(RuntimeError):
+    """Every generated variant duplicated a previously posted image."""
+
+# -------------------- Variant selection --------------------
+def image_hash(data: bytes) -> int:
+    """64-bit difference hash (dHash): robust to re-encoding and resizing, cheap to compare."""
+    with PILImage.open(io.BytesIO(data)) as img:
+        pixels = list(img.convert("L").resize((9, 8), PILImage.LANCZOS).getdata())
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+def hash_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+def get_posted_image_hashes(backfill_limit: int = 20) -> list[int]:
+    """
+    Hashes of previously posted images. Older posts that only have an img_url
+    are hashed on the fly (a few per call) and the hash is stored.
+    """
+    hashes = []
+    backfilled = 0
+    for post_id, img_url, stored_hash in db.posts.get_posted_images():
+        if stored_hash:
+            hashes.append(int(stored_hash, 16))
+            continue
+        if backfilled >= backfill_limit or not img_url.startswith("http"):
+            continue
 
-    image_url = output[0]
-    image_path = f"/tmp/{uuid.uuid4()}.webp"
+        try:
+            resp = requests.get(img_url, timeout=30)
+            resp.raise_for_status()
+            value = image_hash(resp.content)
+        except Exception as e:
+            print(f"Could not hash image of post {post_id}: {e}")
+            continue
 
-    resp = requests.get(image_url)
-    resp.raise_for_status()
+        db.posts.update_post_image_hash(post_id, f"{value:016x}")
+        hashes.append(value)
+        backfilled += 1
 
-    with open(image_path, "wb") as f:
-        f.write(resp.content)
+    return hashes
+
+def select_variants(images: list[ImageBuffer], previous: list[int]) -> list[tuple[ImageBuffer, int]]:
+    """
+    Drop near-duplicates (of posted images and of each other) and order the
+    rest by novelty: distance to the closest previously posted image.
+    Rejected candidates are closed.
+    """
+    scored = []
+    for image in images:
+        value = image_hash(image.getvalue())
+        novelty = min((hash_distance(value, p) for p in previous), default=64)
+        scored.append((novelty, value, image))
+    scored.sort(key=lambda s: s[0], reverse=True)
+
+    kept = []
+    for novelty, value, image in scored:
+        if novelty <= DUPLICATE_HASH_DISTANCE or any(
+            hash_distance(value, k) <= DUPLICATE_HASH_DISTANCE for _, k in kept
+        ):
+            image.close()
+            continue
+        kept.append((image, value))
+
+    return kept
+
+# -------------------- Mastodon --------------------
+async def generate_image_posts_async(profile: str = IMAGE_PROFILE, num_outputs: int = IMAGE_BATCH_SIZE) -> list[PostDraft]:
+    """
+    Generate several variants in one prediction and return the usable ones as
+    drafts, best candidate first. May be empty if every variant was a duplicate.
+    """
+    with core.tracing.span("image.generate", profile=profile, outputs=num_outputs) as span:
+        images = await get_image_backend().generate(build_input(profile, num_outputs))
+        with core.tracing.span("image.select"):
+            previous = await asyncio.to_thread(get_posted_image_hashes)
+            variants = await asyncio.to_thread(select_variants, images, previous)
 
     text = "*This post was AI generated.*"
-    return PostDraft(
-        type="image",
-        platform="mastodon",
-        original_content=text,
-        image_path=image_path
-    )
+    return [
+        PostDraft(
+            type="image",
+            platform="mastodon",
+            original_content=text,
+            image=image,
+            image_hash=f"{value:016x}",
+            metadata={"image_profile": profile},
+            trace_ids=[span.trace_id] if span.trace_id else [],
+        )
+        for image, value in variants
+    ]
+
+async def generate_image_post_async(profile: str = IMAGE_PROFILE) -> PostDraft:
+    drafts = await generate_image_posts_async(profile, num_outputs=1)
+    if not drafts:
+        raise DuplicateImageError("Generated image duplicates a previously posted one")
+    return drafts[0]
+
+def generate_image_post(profile: str = IMAGE_PROFILE) -> PostDraft:
+    return asyncio.run(generate_image_post_async(profile))
+
+# -------------------- Pre-generation --------------------
+class ImagePool:
+    """
+    Keeps a few generated drafts ready so /image/generate doesn't wait on the GPU.
+    `run()` refills the pool in the background, a whole batch of variants per
+    prediction; `get()` falls back to generating on demand when the pool is empty.
+    """
+
+    def __init__(self, size: int = IMAGE_POOL_SIZE, profile: str = IMAGE_POOL_PROFILE):
+        self.size = size
+        self.profile = profile
+        self.drafts: asyncio.Queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+
+    async def run(self):
+        while True:
+            failures = 0
+            while self.drafts.qsize() < self.size:
+                try:
+                    drafts = await generate_image_posts_async(self.profile)
+                    if not drafts:
+                        print("Image pool refill returned only duplicates")
+                except Exception as e:
+                    print(f"Image pool refill failed: {e}")
+                    drafts = []
+
+                for draft in drafts:
+                    self.drafts.put_nowait(draft)
+                if drafts:
+                    failures = 0
+                    continue
+
+                # Every attempt is a paid prediction: back off, and give up until the next request
+                failures += 1
+                if failures >= IMAGE_POOL_REFILL_ATTEMPTS:
+                    print(f"Image pool refill gave up after {failures} attempts")
+                    break
+                await asyncio.sleep(IMAGE_POOL_RETRY_SECONDS)
+
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def get(self, profile: str | None = None) -> PostDraft:
+        if profile and profile != self.profile:
+            return await generate_image_post_async(profile)
+
+        try:
+            draft = self.drafts.get_nowait()
+        except asyncio.QueueEmpty:
+            drafts = []
+            for _ in range(IMAGE_ON_DEMAND_ATTEMPTS):
+                drafts = await generate_image_posts_async(self.profile)
+                if drafts:
+                    break
+            else:
+                raise DuplicateImageError(
+                    f"Every variant of {IMAGE_ON_DEMAND_ATTEMPTS} prediction(s) duplicated a previously posted image"
+                )
+            # Best variant goes to approval now, the rest stay for the next request
+            draft = drafts[0]
+            for extra in drafts[1:]:
+                self.drafts.put_nowait(extra)
+
+        self._wakeup.set()
+        return draft
+
+image_pool = ImagePool()
@@ -0,0 +1,129 @@
+import io
+import os
+import random
+import asyncio
+import requests
+from abc import ABC, abstractmethod
+from PIL import Image as PILImage
+from core.media import ImageBuffer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "replicate" for the real service, "fake" for the local stand-in
+IMAGE_BACKEND = os.getenv("IMAGE_BACKEND", "replicate")
+
+MODEL_VERSION = "24b0b168263d9b15ce91d2e3eeb44958c770602c408a0c947f9d78b8d1fac737"
+PREDICTION_POLL_SECONDS = 1.0
+
+# Fake backend behaviour
+IMAGE_FAKE_LATENCY = float(os.getenv("IMAGE_FAKE_LATENCY", "2.0"))
+IMAGE_FAKE_JITTER = float(os.getenv("IMAGE_FAKE_JITTER", "0.5"))
+IMAGE_FAKE_FAILURE_RATE = float(os.getenv("IMAGE_FAKE_FAILURE_RATE", "0.0"))
+IMAGE_FAKE_FAILURE_MODE = os.getenv("IMAGE_FAKE_FAILURE_MODE", "error")  # "error" or "timeout"
+IMAGE_FAKE_SIZE = int(os.getenv("IMAGE_FAKE_SIZE", "1024"))
+
+class ImageBackend(ABC):
+    @abstractmethod
+    async def generate(self, model_input: dict) -> list[ImageBuffer]:
+        """Run one prediction and return its images (`num_outputs` of them)."""
+
+# -------------------- Replicate --------------------
+class ReplicateBackend(ImageBackend):
+    def __init__(self, version: str = MODEL_VERSION):
+        self.version = version
+
+    async def run_prediction(self, model_input: dict) -> list[str]:
+        """Create a prediction and poll it without blocking the event loop."""
+        import replicate
+
+        prediction = await replicate.predictions.async_create(version=self.version, input=model_input)
+
+        while prediction.status not in ("succeeded", "failed", "canceled"):
+            await asyncio.sleep(PREDICTION_POLL_SECONDS)
+            await prediction.async_reload()
+
+        if prediction.status != "succeeded":
+            raise RuntimeError(f"Prediction {prediction.id} {prediction.status}: {prediction.error}")
+
+        return [str(url) for url in prediction.output]
+
+    async def generate(self, model_input: dict) -> list[ImageBuffer]:
+        output = await self.run_prediction(model_input)
+        return list(await asyncio.gather(*(asyncio.to_thread(download_image, url) for url in output)))
+
+def download_image(image_url: str) -> ImageBuffer:
+    image = ImageBuffer(extension=".webp")
+
+    # Stream straight into the buffer; large images spill to an unlinked temp file
+    with requests.get(image_url, stream=True, timeout=60) as resp:
+        resp.raise_for_status()
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            image.write(chunk)
+
+    return image
+
+# -------------------- Fake --------------------
+class FakeImageBackend(ImageBackend):
+    """
+    Offline stand-in for Replicate: waits `latency` (+/- jitter) seconds per
+    prediction, then returns synthetic images. A `failure_rate` share of
+    predictions raise ("error") or hang past any reasonable deadline ("timeout").
+    """
+
+    def __init__(self, latency: float = IMAGE_FAKE_LATENCY, jitter: float = IMAGE_FAKE_JITTER,
+                 failure_rate: float = IMAGE_FAKE_FAILURE_RATE, failure_mode: str = IMAGE_FAKE_FAILURE_MODE,
+                 size: int = IMAGE_FAKE_SIZE, seed: int | None = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_mode = failure_mode
+        self.size = size
+        self.random = random.Random(seed)
+
+    def render(self, image_format: str) -> ImageBuffer:
+        # A random gradient with some noise: cheap to make, distinct per call
+        r, g, b = (self.random.randrange(256) for _ in range(3))
+        img = PILImage.linear_gradient("L").resize((self.size, self.size))
+        img = PILImage.merge("RGB", (
+            img.point(lambda v: (v + r) % 256),
+            img.rotate(self.random.choice([90, 180, 270])).point(lambda v: (v + g) % 256),
+            PILImage.effect_noise((self.size, self.size), 64).point(lambda v: (v + b) % 256),
+        ))
+
+        out = io.BytesIO()
+        img.save(out, format=image_format.upper())
+        return ImageBuffer.from_bytes(out.getvalue(), f".{image_format}")
+
+    async def generate(self, model_input: dict) -> list[ImageBuffer]:
+        delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        await asyncio.sleep(delay)
+
+        if self.random.random() < self.failure_rate:
+            if self.failure_mode == "timeout":
+                await asyncio.sleep(3600)
+            raise RuntimeError("Fake prediction failed")
+
+        image_format = model_input.get("output_format", "webp")
+        return [
+            await asyncio.to_thread(self.render, image_format)
+            for _ in range(model_input.get("num_outputs", 1))
+        ]
+
+_image_backend: ImageBackend | None = None
+
+def get_image_backend() -> ImageBackend:
+    global _image_backend
+    if _image_backend is None:
+        if IMAGE_BACKEND == "fake":
+            _image_backend = FakeImageBackend()
+        elif IMAGE_BACKEND == "replicate":
+            _image_backend = ReplicateBackend()
+        else:
+            raise ValueError(f"Unknown IMAGE_BACKEND: {IMAGE_BACKEND}")
+    return _image_backend
+
+def set_image_backend(backend: ImageBackend):
+    """Swap the backend (benchmarks, local runs)."""
+    global _image_backend
+    _image_backend = backend
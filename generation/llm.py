@@ -1,5 +1,8 @@
 import os
+import time
 import requests
+import core.metrics
+import core.tracing
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
@@ -12,6 +15,10 @@ OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL")
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL")
 OPENROUTER_STRUCTURED = False
 
+# -------------------- Metrics --------------------
+llm_seconds = core.metrics.histogram("llm_request_seconds", "OpenRouter completion latency", ("model", "outcome"))
+llm_tokens = core.metrics.counter("llm_tokens_total", "Tokens reported by OpenRouter", ("model", "kind"))
+
 # -------------------- Openrouter --------------------
 def call_openrouter(prompt: str, structured: bool, schema: BaseModel = None):
     headers = {
@@ -38,9 +45,22 @@ def call_openrouter(prompt: str, structured: bool, schema: BaseModel = None):
             "max_tokens": 400
         }
 
-    resp = requests.post(OPENROUTER_API_URL, headers=headers, json=payload)
-    resp.raise_for_status()
-    data = resp.json()
+    start = time.perf_counter()
+    try:
+        with core.tracing.span("llm.call", model=OPENROUTER_MODEL, prompt_chars=len(prompt)) as span:
+            resp = requests.post(OPENROUTER_API_URL, headers=headers, json=payload)
+            resp.raise_for_status()
+            data = resp.json()
+            span.set(**(data.get("usage") or {}))
+    except Exception:
+        llm_seconds.observe(time.perf_counter() - start, model=OPENROUTER_MODEL, outcome="error")
+        raise
+    llm_seconds.observe(time.perf_counter() - start, model=OPENROUTER_MODEL, outcome="ok")
+
+    usage = data.get("usage") or {}
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            llm_tokens.inc(usage[kind], model=OPENROUTER_MODEL, kind=kind.removesuffix("_tokens"))
 
     content = data["choices"][0]["message"]["content"]
     if structured:
@@ -94,7 +94,7 @@ def generate_replies():
             platform="mastodon",
             original_content=reply_text,
             parent_post_id=status_id,
-            metadata={"parent_text": status_text}
+            metadata={"parent_text": status_text, "parent_status_id": status_id}
         )
 
         drafts.append(draft)
@@ -1,6 +1,6 @@
 import os
 import db.rag
-from fastembed import TextEmbedding
+import db.embedding
 from generation.llm import call_openrouter
 from core.models import PostDraft
 from pydantic import BaseModel
@@ -16,12 +16,6 @@ MASTODON_ACCESS_TOKEN = os.getenv("MASTODON_ACCESS_TOKEN")
 # Global variables
 STRUCTURED_OUTPUT = False
 
-# Suppress Hugging Face token warning
-os.environ["HF_HUB_DISABLE_IMPLICIT_TOKEN"] = "1"
-
-# Initialize the embedding model (downloads on first use)
-embedding_model = TextEmbedding(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
 # -------------------- Structured Outputs --------------------
 class MastodonRagReply(BaseModel):
     post_text: str
@@ -31,7 +25,8 @@ def generate_reply(status):
     status_text = status["content"]  # or ["text"] depending on API
     status_id = status["id"]
 
-    query_embedding = next(embedding_model.embed(status_text))
+    # Shared model (db.embedding), so query embeddings are counted with the rest
+    query_embedding = db.embedding.embed_texts([status_text], "reply")[0]
     rag_results = db.rag.hybrid_search(status_text, query_embedding)
 
     if not rag_results:
@@ -62,7 +57,7 @@ def generate_reply(status):
         platform="mastodon",
         original_content=reply_text,
         parent_post_id=status_id,
-        metadata={"parent_text": status_text}
+        metadata={"parent_text": status_text, "parent_status_id": status_id}
     )
 
     return draft
@@ -2,11 +2,16 @@ import os
 import asyncio
 import db.posts
 import db.feedback
+import core.metrics
+import core.tracing
+from dataclasses import dataclass
 from core.models import PostDraft, Post
-from telegram import Bot
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from core.media import ImageBuffer
+from hitl.policy import evaluate_draft
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ForceReply
 from telegram.ext import Application, CallbackQueryHandler, ContextTypes
-from telegram import Update
+from telegram.error import TelegramError
+from telegram import Update, Message
 from telegram.ext import MessageHandler, filters
 from dotenv import load_dotenv
 
@@ -19,221 +24,621 @@ TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 os.environ["TELEGRAM_BOT_TOKEN"] = TELEGRAM_BOT_TOKEN
 os.environ["TELEGRAM_CHAT_ID"] = TELEGRAM_CHAT_ID
 
-# -------------------- Telegram --------------------
-feedback_pending_post = None
-feedback_decision = None
-feedback_reason = None
-feedback_edited_post = None
-
-waiting_for_reason = False
-waiting_for_edit = False
-
-feedback_done = asyncio.Event()
-
-async def wait_for_approval_image(img_path: str) -> tuple[str, str | None]:
-    """
-    Returns:
-      ("approve", None)
-      ("reject", None)
+# Optional webhook mode (polling is used when no URL is set)
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL")
+TELEGRAM_WEBHOOK_LISTEN = os.getenv("TELEGRAM_WEBHOOK_LISTEN", "127.0.0.1")
+TELEGRAM_WEBHOOK_PORT = int(os.getenv("TELEGRAM_WEBHOOK_PORT", "8443"))
+TELEGRAM_WEBHOOK_PATH = os.getenv("TELEGRAM_WEBHOOK_PATH", "telegram")
+
+# Digest mode: text drafts are grouped into one paginated review message
+HITL_DIGEST_MODE = os.getenv("HITL_DIGEST_MODE", "false").lower() in ("1", "true", "yes")
+HITL_DIGEST_BATCH_SIZE = int(os.getenv("HITL_DIGEST_BATCH_SIZE", "10"))
+HITL_DIGEST_FLUSH_SECONDS = float(os.getenv("HITL_DIGEST_FLUSH_SECONDS", "60"))
+HITL_DIGEST_PAGE_SIZE = int(os.getenv("HITL_DIGEST_PAGE_SIZE", "5"))
+HITL_DIGEST_PREVIEW_CHARS = 500
+
+# Approval deadline in seconds (0 waits forever) and what happens when it passes
+HITL_APPROVAL_TIMEOUT = float(os.getenv("HITL_APPROVAL_TIMEOUT", "3600"))
+HITL_TIMEOUT_ACTION = os.getenv("HITL_TIMEOUT_ACTION", "reject")
+if HITL_TIMEOUT_ACTION not in ("approve", "reject"):
+    raise ValueError("HITL_TIMEOUT_ACTION must be 'approve' or 'reject'")
+
+DECISION_STATUS = {
+    "approve": "approved",
+    "reject": "rejected",
+    "edit": "edited",
+    "auto_approve": "approved",
+    "auto_reject": "rejected",
+    "timeout_approve": "approved",
+    "timeout_reject": "rejected",
+}
+DECISION_ICON = {
+    "approve": "✅",
+    "reject": "❌",
+    "edit": "✏️",
+    "timeout_approve": "⌛✅",
+    "timeout_reject": "⌛❌",
+}
+
+# -------------------- Metrics --------------------
+approval_wait = core.metrics.histogram(
+    "hitl_approval_wait_seconds", "Time a draft waits for its review decision", ("type",)
+)
+decisions_total = core.metrics.counter("hitl_decisions_total", "Review decisions recorded", ("decision",))
+pending_approvals = core.metrics.gauge("hitl_pending_approvals", "Drafts waiting for a decision")
+
+# -------------------- Approval Manager --------------------
+@dataclass
+class PendingApproval:
+    post_id: int
+    content: str
+    future: asyncio.Future
+    awaiting: str | None = None  # "reason" or "edit" while a text reply is expected
+    parent_text: str | None = None
+    digest_id: int | None = None
+    decision: str | None = None
+    message: Message | None = None  # the Telegram message carrying this draft's buttons
+
+@dataclass
+class Digest:
+    id: int
+    items: list[PendingApproval]
+    page: int = 0
+    chat_id: int | None = None
+    message_id: int | None = None
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.items) // HITL_DIGEST_PAGE_SIZE))
+
+    @property
+    def undecided(self) -> list[PendingApproval]:
+        return [item for item in self.items if item.decision is None]
+
+    def render(self) -> tuple[str, InlineKeyboardMarkup | None]:
+        start = self.page * HITL_DIGEST_PAGE_SIZE
+        page_items = self.items[start:start + HITL_DIGEST_PAGE_SIZE]
+
+        lines = [
+            f"📋 Review digest #{self.id} — page {self.page + 1}/{self.page_count} "
+            f"({len(self.undecided)}/{len(self.items)} pending)"
+        ]
+        rows = []
+        for n, item in enumerate(page_items, start=start + 1):
+            mark = f" {DECISION_ICON[item.decision]}" if item.decision else ""
+            preview = item.content
+            if len(preview) > HITL_DIGEST_PREVIEW_CHARS:
+                preview = preview[:HITL_DIGEST_PREVIEW_CHARS] + "…"
+            lines.append(f"\n[{n}] post {item.post_id}{mark}\n{preview}")
+            if item.parent_text:
+                lines.append(f"↪️ Parent: {item.parent_text[:200]}")
+
+            if item.decision is None:
+                rows.append([
+                    InlineKeyboardButton(f"✅ {n}", callback_data=f"dapprove:{item.post_id}"),
+                    InlineKeyboardButton(f"❌ {n}", callback_data=f"dreject:{item.post_id}"),
+                    InlineKeyboardButton(f"✏️ {n}", callback_data=f"dedit:{item.post_id}"),
+                ])
+
+        if not self.undecided:
+            return "\n".join(lines), None
+
+        nav = []
+        if self.page > 0:
+            nav.append(InlineKeyboardButton("◀️", callback_data=f"dpage:{self.id}:{self.page - 1}"))
+        if self.page < self.page_count - 1:
+            nav.append(InlineKeyboardButton("▶️", callback_data=f"dpage:{self.id}:{self.page + 1}"))
+        if nav:
+            rows.append(nav)
+        rows.append([InlineKeyboardButton("✅ Approve all", callback_data=f"dall:{self.id}")])
+
+        return "\n".join(lines), InlineKeyboardMarkup(rows)
+
+class ApprovalManager:
     """
-    global feedback_pending_post, feedback_decision
+    Tracks every draft waiting on a human, keyed by post id.
 
-    async def handle_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        global feedback_decision
+    The post id is encoded in the callback data of the inline buttons
+    ("approve:42"), so any number of drafts can be reviewed in any order
+    through one long-lived Telegram application. Decisions are delivered
+    to the waiting callers through futures.
+    """
 
+    def __init__(self):
+        self.pending: dict[int, PendingApproval] = {}
+        self.reply_prompts: dict[int, int] = {}  # prompt message id -> post id
+        self.app = None
+        self.loop = None
+        self._app_lock = asyncio.Lock()
+
+        self.digest_queue: list[PendingApproval] = []
+        self.digests: dict[int, Digest] = {}
+        self._next_digest_id = 1
+        self._flush_task = None
+
+    # ---------- Listener lifecycle ----------
+    async def start(self):
+        """Start the shared Telegram application. Called once from the API lifespan."""
+        async with self._app_lock:
+            if self.app is not None:
+                return
+
+            app = Application.builder().token(os.environ["TELEGRAM_BOT_TOKEN"]).build()
+            app.add_handler(CallbackQueryHandler(self.handle_button))
+            app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text))
+
+            await app.initialize()
+            await app.start()
+            if TELEGRAM_WEBHOOK_URL:
+                await app.updater.start_webhook(
+                    listen=TELEGRAM_WEBHOOK_LISTEN,
+                    port=TELEGRAM_WEBHOOK_PORT,
+                    url_path=TELEGRAM_WEBHOOK_PATH,
+                    webhook_url=f"{TELEGRAM_WEBHOOK_URL.rstrip('/')}/{TELEGRAM_WEBHOOK_PATH}",
+                )
+            else:
+                await app.updater.start_polling()
+
+            self.app = app
+            self.loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        async with self._app_lock:
+            if self.app is None:
+                return
+
+            # Release anyone still waiting so their workers can exit
+            for pending in self.pending.values():
+                if not pending.future.done():
+                    pending.future.cancel()
+
+            app, self.app, self.loop = self.app, None, None
+            await app.updater.stop()
+            await app.stop()
+            await app.shutdown()
+
+    # ---------- Pending drafts ----------
+    async def wait_for(self, post_id: int, content: str, send) -> tuple[str, str | None]:
+        """
+        Register a draft, send it with `send(bot)` and wait for its decision.
+
+        After HITL_APPROVAL_TIMEOUT seconds the draft is released with
+        ("timeout_<HITL_TIMEOUT_ACTION>", reason).
+        """
+        loop = asyncio.get_running_loop()
+        pending = PendingApproval(post_id=post_id, content=content, future=loop.create_future())
+        self.pending[post_id] = pending
+
+        try:
+            if self.app is None:
+                await self.start()
+            pending.message = await send(self.app.bot)
+            try:
+                return await asyncio.wait_for(pending.future, HITL_APPROVAL_TIMEOUT or None)
+            except asyncio.TimeoutError:
+                return await self._expire(pending)
+        finally:
+            self.pending.pop(post_id, None)
+            self.reply_prompts = {
+                mid: pid for mid, pid in self.reply_prompts.items() if pid != post_id
+            }
+
+    def resolve(self, post_id: int, decision: str, payload: str | None = None):
+        pending = self.pending.get(post_id)
+        if pending and not pending.future.done():
+            pending.decision = decision
+            pending.future.set_result((decision, payload))
+
+    async def _expire(self, pending: PendingApproval) -> tuple[str, str]:
+        """Apply the default action to a draft nobody answered and tell the operator."""
+        decision = f"timeout_{HITL_TIMEOUT_ACTION}"
+        reason = f"no decision after {HITL_APPROVAL_TIMEOUT:g}s"
+        pending.decision = decision
+        pending.awaiting = None
+
+        if pending.digest_id is not None:
+            await self.decide_digest([(pending, decision, reason)])
+        elif pending.message is not None:
+            try:
+                await pending.message.edit_reply_markup(reply_markup=None)
+                await pending.message.reply_text(
+                    f"⌛ EXPIRED (post {pending.post_id}): {reason}, defaulting to {HITL_TIMEOUT_ACTION}."
+                )
+            except TelegramError as e:
+                print(f"[hitl] could not mark post {pending.post_id} as expired: {e}")
+
+        return decision, reason
+
+    # ---------- Digest mode ----------
+    async def wait_for_digest(self, post_id: int, content: str, parent_text: str | None = None) -> tuple[str, str | None]:
+        """
+        Queue a text draft for the next review digest and wait for its decision.
+
+        The decision is already persisted (in bulk with the rest of the digest)
+        when this returns.
+        """
+        loop = asyncio.get_running_loop()
+        pending = PendingApproval(
+            post_id=post_id, content=content, future=loop.create_future(), parent_text=parent_text
+        )
+        self.pending[post_id] = pending
+        self.digest_queue.append(pending)
+
+        try:
+            if self.app is None:
+                await self.start()
+
+            if len(self.digest_queue) >= HITL_DIGEST_BATCH_SIZE:
+                await self.flush_digest()
+            elif self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self._flush_later())
+
+            try:
+                return await asyncio.wait_for(pending.future, HITL_APPROVAL_TIMEOUT or None)
+            except asyncio.TimeoutError:
+                if pending.digest_id is None:
+                    # Never made it into a digest, record it on its own
+                    self.digest_queue.remove(pending)
+                    decision = f"timeout_{HITL_TIMEOUT_ACTION}"
+                    reason = f"no decision after {HITL_APPROVAL_TIMEOUT:g}s"
+                    record_decisions([(post_id, decision, reason, content)])
+                    return decision, reason
+                return await self._expire(pending)
+        finally:
+            self.pending.pop(post_id, None)
+            if pending in self.digest_queue:
+                self.digest_queue.remove(pending)
+            self.reply_prompts = {
+                mid: pid for mid, pid in self.reply_prompts.items() if pid != post_id
+            }
+
+    async def _flush_later(self):
+        await asyncio.sleep(HITL_DIGEST_FLUSH_SECONDS)
+        await self.flush_digest()
+
+    async def flush_digest(self):
+        """Send every queued draft as review digests of at most HITL_DIGEST_BATCH_SIZE items."""
+        while self.digest_queue:
+            batch = self.digest_queue[:HITL_DIGEST_BATCH_SIZE]
+            del self.digest_queue[:HITL_DIGEST_BATCH_SIZE]
+
+            digest = Digest(id=self._next_digest_id, items=batch)
+            self._next_digest_id += 1
+            for item in batch:
+                item.digest_id = digest.id
+            self.digests[digest.id] = digest
+
+            text, keyboard = digest.render()
+            message = await self.app.bot.send_message(
+                chat_id=int(os.environ["TELEGRAM_CHAT_ID"]),
+                text=text,
+                reply_markup=keyboard,
+            )
+            digest.chat_id = message.chat_id
+            digest.message_id = message.message_id
+
+    async def _refresh_digest(self, digest: Digest):
+        text, keyboard = digest.render()
+        await self.app.bot.edit_message_text(
+            chat_id=digest.chat_id,
+            message_id=digest.message_id,
+            text=text,
+            reply_markup=keyboard,
+        )
+        if not digest.undecided:
+            self.digests.pop(digest.id, None)
+
+    async def decide_digest(self, decisions: list[tuple[PendingApproval, str, str | None]]):
+        """Persist a group of digest decisions in one go, then release their callers."""
+        record_decisions([
+            (pending.post_id, decision, payload, pending.content)
+            for pending, decision, payload in decisions
+        ])
+
+        digest_ids = set()
+        for pending, decision, payload in decisions:
+            pending.decision = decision
+            self.resolve(pending.post_id, decision, payload)
+            digest_ids.add(pending.digest_id)
+
+        for digest_id in digest_ids:
+            if digest_id in self.digests:
+                try:
+                    await self._refresh_digest(self.digests[digest_id])
+                except TelegramError as e:
+                    print(f"[hitl] could not refresh digest #{digest_id}: {e}")
+
+    async def _handle_digest_button(self, query, action: str, arg: str):
+        if action == "dpage":
+            digest_id, _, page = arg.partition(":")
+            digest = self.digests.get(int(digest_id)) if digest_id.isdigit() else None
+            if digest and page.isdigit():
+                digest.page = min(int(page), digest.page_count - 1)
+                await self._refresh_digest(digest)
+            return
+
+        if action == "dall":
+            digest = self.digests.get(int(arg)) if arg.isdigit() else None
+            if digest:
+                # Drafts the operator is rejecting or editing keep waiting for that answer
+                skipped = [item for item in digest.undecided if item.awaiting]
+                await self.decide_digest([
+                    (item, "approve", None) for item in digest.undecided if not item.awaiting
+                ])
+                if skipped:
+                    await query.message.reply_text(
+                        f"⏸ Approved all but {len(skipped)} draft(s) awaiting a rejection reason or edit: "
+                        + ", ".join(f"post {item.post_id}" for item in skipped)
+                    )
+            return
+
+        pending = self.pending.get(int(arg)) if arg.isdigit() else None
+        if pending is None or pending.decision is not None:
+            return
+
+        if action == "dapprove":
+            await self.decide_digest([(pending, "approve", None)])
+        elif action == "dreject":
+            await self._prompt_reason(pending, query.message)
+        elif action == "dedit":
+            await self._prompt_edit(pending, query.message)
+
+    # ---------- Telegram handlers ----------
+    async def _prompt_reason(self, pending: PendingApproval, message):
+        pending.awaiting = "reason"
+        prompt = await message.reply_text(
+            f"❌ REJECTED (post {pending.post_id})\n\n"
+            "Please reply to this message with the reason for rejection.\n"
+            "This feedback helps improve future posts.\n\n"
+            "Examples: 'Too promotional' or 'Wrong tone'",
+            reply_markup=ForceReply(selective=True),
+        )
+        self.reply_prompts[prompt.message_id] = pending.post_id
+
+    async def _prompt_edit(self, pending: PendingApproval, message):
+        pending.awaiting = "edit"
+        await message.reply_text(
+            f"✏️ EDIT MODE (post {pending.post_id})\n\n"
+            "Please reply to the next message with the *edited version* of the post.\n\n"
+            "You can copy the text below and modify it."
+        )
+        prompt = await message.reply_text(
+            pending.content,
+            reply_markup=ForceReply(selective=True),
+        )
+        self.reply_prompts[prompt.message_id] = pending.post_id
+
+    async def handle_button(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
 
+        action, _, raw_id = (query.data or "").partition(":")
+        if action.startswith("d"):
+            await self._handle_digest_button(query, action, raw_id)
+            return
+
+        pending = self.pending.get(int(raw_id)) if raw_id.isdigit() else None
+        if pending is None:
+            await query.edit_message_reply_markup(reply_markup=None)
+            await query.message.reply_text("⚠️ This draft is no longer awaiting approval.")
+            return
+
         await query.edit_message_reply_markup(reply_markup=None)
 
-        if query.data == "approve":
-            feedback_decision = "approve"
-            await query.reply_text(f"✅ APPROVED\n\n")
-            feedback_done.set()
-        elif query.data == "reject":
-            feedback_decision = "reject"
-            await query.message.reply_text("❌ REJECTED\n\n")
+        if action == "approve":
+            await query.message.reply_text(f"✅ APPROVED (post {pending.post_id})")
+            self.resolve(pending.post_id, "approve")
+        elif action == "reject" and query.message.photo:
+            await query.message.reply_text(f"❌ REJECTED (post {pending.post_id})")
+            self.resolve(pending.post_id, "reject")
+        elif action == "reject":
+            await self._prompt_reason(pending, query.message)
+        elif action == "edit":
+            await self._prompt_edit(pending, query.message)
+
+    def _match_text_reply(self, message) -> PendingApproval | None:
+        # Prefer the explicit reply target, fall back to the only draft awaiting input
+        if message.reply_to_message:
+            post_id = self.reply_prompts.get(message.reply_to_message.message_id)
+            if post_id in self.pending:
+                return self.pending[post_id]
+
+        awaiting = [p for p in self.pending.values() if p.awaiting]
+        if len(awaiting) == 1:
+            return awaiting[0]
+        return None
+
+    async def handle_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        text = update.message.text
+        pending = self._match_text_reply(update.message)
+
+        if pending is None:
+            if any(p.awaiting for p in self.pending.values()):
+                await update.message.reply_text(
+                    "⚠️ Several drafts are waiting for input. "
+                    "Please reply directly to the prompt message of the draft."
+                )
+            return
+
+        if pending.awaiting == "reason":
+            decision = "reject"
+            await update.message.reply_text(
+                f"📝 Feedback recorded for post {pending.post_id}!\n\nReason: {text}"
+            )
+        elif pending.awaiting == "edit":
+            decision = "edit"
+            await update.message.reply_text(
+                f"✏️ Edit received for post {pending.post_id}! Using the new version:\n\n{text}"
+            )
+        else:
+            return
+
+        pending.awaiting = None
+        if pending.digest_id is not None:
+            await self.decide_digest([(pending, decision, text)])
+        else:
+            self.resolve(pending.post_id, decision, text)
 
-    # Reset state
-    feedback_decision = None
-    feedback_done.clear()
+approvals = ApprovalManager()
+pending_approvals.set_function(lambda: len(approvals.pending))
 
-    # Send the post with buttons
-    bot = Bot(token=os.environ["TELEGRAM_BOT_TOKEN"])
+# -------------------- Telegram --------------------
+async def wait_for_approval_image(post_id: int, image: ImageBuffer) -> tuple[str, str | None]:
+    """
+    Returns:
+      ("approve", None)
+      ("reject", None)
+    """
     keyboard = InlineKeyboardMarkup([
         [
-            InlineKeyboardButton("✅ Approve", callback_data="approve"),
-            InlineKeyboardButton("❌ Reject", callback_data="reject"),
+            InlineKeyboardButton("✅ Approve", callback_data=f"approve:{post_id}"),
+            InlineKeyboardButton("❌ Reject", callback_data=f"reject:{post_id}"),
         ]
     ])
 
-    bot = Bot(token=os.environ["TELEGRAM_BOT_TOKEN"])
-    caption_text = "📝 New Post for Approval"
-    await bot.send_photo(
-        chat_id=int(os.environ["TELEGRAM_CHAT_ID"]),
-        photo=open(img_path, "rb"),
-        caption=caption_text,
-        reply_markup=keyboard
-    )
+    async def send(bot):
+        return await bot.send_photo(
+            chat_id=int(os.environ["TELEGRAM_CHAT_ID"]),
+            photo=image.getvalue(),
+            filename=f"post-{post_id}{image.extension}",
+            caption=f"📝 New Post for Approval (post {post_id})",
+            reply_markup=keyboard
+        )
 
-    # Set up the listener
-    app = Application.builder().token(os.environ["TELEGRAM_BOT_TOKEN"]).build()
-    app.add_handler(CallbackQueryHandler(handle_button))
+    return await approvals.wait_for(post_id, repr(image), send)
 
-    await app.initialize()
-    await app.start()
-    await app.updater.start_polling()
 
-    # Wait for completion
-    await feedback_done.wait()
-
-    # Cleanup
-    await app.updater.stop()
-    await app.stop()
-    await app.shutdown()
-
-    return feedback_decision, None
-
-
-async def wait_for_approval_text(post_content: str, parent_text = str | None) -> tuple[str, str | None]:
+async def wait_for_approval_text(post_id: int, post_content: str, parent_text: str | None = None) -> tuple[str, str | None]:
     """
     Returns:
       ("approve", None)
       ("reject", reason)
       ("edit", edited_post)
     """
-    global feedback_pending_post, feedback_decision, feedback_reason, feedback_edited_post, waiting_for_reason, waiting_for_edit
-
-    async def handle_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        global feedback_decision, waiting_for_reason, waiting_for_edit
-
-        query = update.callback_query
-        await query.answer()
-
-        await query.edit_message_reply_markup(reply_markup=None)
-
-        if query.data == "approve":
-            feedback_decision = "approve"
-            await query.edit_message_text(f"✅ APPROVED\n\n{feedback_pending_post}")
-            feedback_done.set()
-        elif query.data == "reject":
-            feedback_decision = "reject"
-            waiting_for_reason = True
-            waiting_for_edit = False
-            await query.message.reply_text(
-                "❌ REJECTED\n\n"
-                "Please reply with the reason for rejection.\n"
-                "This feedback helps improve future posts.\n\n"
-                "Examples: 'Too promotional' or 'Wrong tone'"
-            )
-        elif query.data == "edit":
-            feedback_decision = "edit"
-            waiting_for_edit = True
-            waiting_for_reason = False
-            await query.edit_message_text(
-                "✏️ EDIT MODE\n\n"
-                "Please reply with the *edited version* of the post.\n\n"
-                "You can copy the text below and modify it."
-            )
-            await query.message.reply_text(feedback_pending_post)
-
-    async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        global feedback_reason, feedback_edited_post
-        global waiting_for_reason, waiting_for_edit
-
-        text = update.message.text
-
-        if waiting_for_reason:
-            feedback_reason = text
-            waiting_for_reason = False
-            await update.message.reply_text(
-                f"📝 Feedback recorded!\n\nReason: {feedback_reason}"
-            )
-            feedback_done.set()
-
-        elif waiting_for_edit:
-            feedback_edited_post = text
-            waiting_for_edit = False
-
-            await update.message.reply_text(
-                f"✏️ Edit received! Using the new version:\n\n{feedback_edited_post}"
-            )
-            feedback_done.set()
-
-    # Reset state
-    feedback_pending_post = post_content
-    feedback_decision = None
-    feedback_reason = None
-    feedback_edited_post = None
-    waiting_for_reason = False
-    waiting_for_edit = False
-    feedback_done.clear()
-
-    # Send the post with buttons
-    bot = Bot(token=os.environ["TELEGRAM_BOT_TOKEN"])
     keyboard = InlineKeyboardMarkup([
         [
-            InlineKeyboardButton("✅ Approve", callback_data="approve"),
-            InlineKeyboardButton("❌ Reject", callback_data="reject"),
-            InlineKeyboardButton("✏️ Edit", callback_data="edit")
+            InlineKeyboardButton("✅ Approve", callback_data=f"approve:{post_id}"),
+            InlineKeyboardButton("❌ Reject", callback_data=f"reject:{post_id}"),
+            InlineKeyboardButton("✏️ Edit", callback_data=f"edit:{post_id}")
         ]
     ])
 
-    message_text = f"📝 New Post for Approval\n\n{post_content}\n\n"
+    message_text = f"📝 New Post for Approval (post {post_id})\n\n{post_content}\n\n"
     if parent_text:
         message_text += f"Parent Post: {parent_text}\n\n"
 
     message_text += f"Characters: {len(post_content)}"
-    await bot.send_message(
-        chat_id=int(os.environ["TELEGRAM_CHAT_ID"]),
-        text=message_text,
-        reply_markup=keyboard,
-    )
-
-    # Set up the listener
-    app = Application.builder().token(os.environ["TELEGRAM_BOT_TOKEN"]).build()
-    app.add_handler(CallbackQueryHandler(handle_button))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
-
-    await app.initialize()
-    await app.start()
-    await app.updater.start_polling()
-
-    # Wait for completion
-    await feedback_done.wait()
-
-    # Cleanup
-    await app.updater.stop()
-    await app.stop()
-    await app.shutdown()
-
-    if feedback_decision == "edit":
-        return "edit", feedback_edited_post
-    elif feedback_decision == "reject":
-        return "reject", feedback_reason
-    else:
-        return "approve", None
 
-def hitl(post: PostDraft) -> Post:
+    async def send(bot):
+        return await bot.send_message(
+            chat_id=int(os.environ["TELEGRAM_CHAT_ID"]),
+            text=message_text,
+            reply_markup=keyboard,
+        )
+
+    return await approvals.wait_for(post_id, post_content, send)
+
+# -------------------- Decisions --------------------
+def record_decisions(decisions: list[tuple[int, str, str | None, str]]):
+    """
+    Persist (post_id, decision, payload, content) tuples: one feedback row and
+    one status update per post, written in bulk. The payload of an "edit" is
+    the edited text and becomes the post's final_content.
+    """
+    if not decisions:
+        return
+
+    db.feedback.create_feedback_batch([
+        {
+            "post_id": post_id,
+            "decision": decision,
+            "reason": payload if decision != "edit" else None,
+            "content": content,
+        }
+        for post_id, decision, payload, content in decisions
+    ])
+    db.posts.update_final_contents([
+        (post_id, payload) for post_id, decision, payload, _ in decisions if decision == "edit"
+    ])
+    db.posts.update_statuses([
+        (post_id, DECISION_STATUS[decision]) for post_id, decision, _, _ in decisions
+    ])
+    for _, decision, _, _ in decisions:
+        decisions_total.inc(decision=decision)
+
+async def hitl_async(post: PostDraft) -> Post:
+    """
+    Persist the draft and wait for a human decision. Safe to await for many drafts at once.
+    """
+    with core.tracing.span("hitl", type=post.type) as span:
+        return await _hitl_async(post, span)
+
+async def _hitl_async(post: PostDraft, span) -> Post:
     post_id = db.posts.create_post(post, status="pending")
+    span.set(post_id=post_id)
+    # This trace, and whatever produced the draft, make up the post's waterfall
+    core.tracing.link_post(post_id, post.trace_ids)
+
+    # Fast path: confident policy decisions never reach Telegram
+    # DB reads and embeddings (maybe the first model load): off the event loop
+    verdict = await asyncio.to_thread(evaluate_draft, post)
+    if verdict.action != "review":
+        print(f"[hitl] post {post_id} auto {verdict.action}: {verdict.reason}")
+        span.set(auto=verdict.action)
+        record_decisions([(post_id, f"auto_{verdict.action}", verdict.reason, post.original_content)])
+        return db.posts.get_post(post_id)
 
     if post.type in ["text", "reply"]:
-        decision, payload = asyncio.run(wait_for_approval_text(post.original_content, post.metadata.get("parent_text")))
-        if decision == "approve":
-            db.posts.update_status(post_id, "approved")
-        elif decision == "reject":
-            db.feedback.create_feedback(post_id=post_id, decision="reject", reason=payload, content=post.original_content)
-            db.posts.update_status(post_id, "rejected")
-        elif decision == "edit":
-            # Update final_content
-            db.posts.update_status(post_id, "edited")
+        parent_text = db.posts.get_parent_text(post)
+        if HITL_DIGEST_MODE:
+            # Recorded by the digest together with the rest of its batch
+            with core.tracing.span("hitl.approval", mode="digest"), approval_wait.time(type=post.type):
+                await approvals.wait_for_digest(post_id, post.original_content, parent_text)
+            return db.posts.get_post(post_id)
+
+        with core.tracing.span("hitl.approval", mode="message") as approval, approval_wait.time(type=post.type):
+            decision, payload = await wait_for_approval_text(post_id, post.original_content, parent_text)
+        approval.set(decision=decision)
+        record_decisions([(post_id, decision, payload, post.original_content)])
 
     elif post.type == "image":
-        decision, _ = asyncio.run(wait_for_approval_image(post.image_path))
-
-        if decision == "approve":
-            db.posts.update_status(post_id, "approved")
-        elif decision == "reject":
-            db.posts.update_status(post_id, "rejected")
+        if post.image is None and post.image_path:
+            post.image = ImageBuffer.from_file(post.image_path)
+
+        with core.tracing.span("hitl.approval", mode="image") as approval, approval_wait.time(type=post.type):
+            decision, _ = await wait_for_approval_image(post_id, post.image)
+        approval.set(decision=decision)
+        record_decisions([(post_id, decision, None, post.original_content)])
+
+        if DECISION_STATUS[decision] == "rejected":
+            post.image.close()
+        else:
+            # The image travels on in memory to the publisher
+            reviewed = db.posts.get_post(post_id)
+            reviewed.image = post.image
+            return reviewed
 
     return db.posts.get_post(post_id)
+
+def hitl(post: PostDraft) -> Post:
+    """
+    Blocking variant for worker threads and scripts.
+
+    Reuses the long-lived application's loop when it is running, otherwise
+    runs a one-off loop with its own application.
+    """
+    loop = approvals.loop
+    if loop is not None and loop.is_running():
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run_coroutine_threadsafe(hitl_async(post), loop).result()
+        raise RuntimeError("hitl() called from the event loop, use `await hitl_async(post)` instead")
+
+    async def run_once():
+        try:
+            return await hitl_async(post)
+        finally:
+            await approvals.stop()
+
+    return asyncio.run(run_once())
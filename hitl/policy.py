@@ -0,0 +1,110 @@
+import os
+import threading
+import numpy as np
+import db.feedback
+from collections import OrderedDict
+from dataclasses import dataclass
+from core.models import PostDraft
+from db.embedding import embed_texts
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# -------------------- Configuration --------------------
+HITL_AUTO_POLICY = os.getenv("HITL_AUTO_POLICY", "false").lower() in ("1", "true", "yes")
+# Minimum weighted approval rate among the nearest reviewed drafts to skip the human
+HITL_AUTO_APPROVE_SCORE = float(os.getenv("HITL_AUTO_APPROVE_SCORE", "0.9"))
+# The nearest neighbours must be at least this similar for their votes to count
+HITL_AUTO_APPROVE_MIN_SIMILARITY = float(os.getenv("HITL_AUTO_APPROVE_MIN_SIMILARITY", "0.6"))
+# ...and there must be at least this many of them (one lucky match is not a track record)
+HITL_AUTO_APPROVE_MIN_NEIGHBOURS = int(os.getenv("HITL_AUTO_APPROVE_MIN_NEIGHBOURS", "3"))
+# Cosine similarity to a rejected draft above which a new draft is a near-duplicate
+HITL_AUTO_REJECT_SIMILARITY = float(os.getenv("HITL_AUTO_REJECT_SIMILARITY", "0.95"))
+# Don't auto-decide anything until this many human decisions exist
+HITL_POLICY_MIN_HISTORY = int(os.getenv("HITL_POLICY_MIN_HISTORY", "20"))
+HITL_POLICY_NEIGHBOURS = int(os.getenv("HITL_POLICY_NEIGHBOURS", "10"))
+HITL_POLICY_HISTORY_LIMIT = int(os.getenv("HITL_POLICY_HISTORY_LIMIT", "1000"))
+
+# How much each human decision counts towards approval
+DECISION_WEIGHT = {"approve": 1.0, "edit": 0.5, "reject": 0.0}
+
+# post id -> normalized embedding of the reviewed content, least recently used first;
+# bounded by the history window, so posts that fell out of it are evicted
+_embedding_cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+# evaluate_draft runs in worker threads, possibly several at once
+_embedding_cache_lock = threading.Lock()
+
+@dataclass
+class PolicyVerdict:
+    action: str  # "approve", "reject" or "review"
+    score: float
+    reason: str
+
+# -------------------- Scoring --------------------
+def _embed(texts: list[str]) -> np.ndarray:
+    vectors = np.array(embed_texts(texts, "policy"), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _history_matrix(history: list[dict]) -> np.ndarray:
+    with _embedding_cache_lock:
+        missing = [h for h in history if h["post_id"] not in _embedding_cache]
+        if missing:
+            for h, vector in zip(missing, _embed([h["content"] for h in missing])):
+                _embedding_cache[h["post_id"]] = vector
+
+        matrix = np.stack([_embedding_cache[h["post_id"]] for h in history])
+        for h in history:
+            _embedding_cache.move_to_end(h["post_id"])
+        while len(_embedding_cache) > max(HITL_POLICY_HISTORY_LIMIT, len(history)):
+            _embedding_cache.popitem(last=False)
+    return matrix
+
+def evaluate_draft(draft: PostDraft) -> PolicyVerdict:
+    """
+    Decide whether a text draft needs a human.
+
+    Compares the draft against previously reviewed posts: near-duplicates of
+    rejected posts are rejected, drafts whose closest reviewed neighbours were
+    (almost) all approved are approved, and everything else goes to review.
+    """
+    if not HITL_AUTO_POLICY or draft.type not in ("text", "reply"):
+        return PolicyVerdict("review", 0.0, "policy disabled for this draft")
+
+    history = db.feedback.get_decision_history(HITL_POLICY_HISTORY_LIMIT)
+    if len(history) < HITL_POLICY_MIN_HISTORY:
+        return PolicyVerdict("review", 0.0, f"only {len(history)} reviewed posts")
+
+    draft_vector = _embed([draft.original_content])[0]
+    similarities = _history_matrix(history) @ draft_vector
+
+    rejected = [i for i, h in enumerate(history) if h["decision"] == "reject"]
+    if rejected:
+        nearest_rejected = max(rejected, key=lambda i: similarities[i])
+        similarity = float(similarities[nearest_rejected])
+        if similarity >= HITL_AUTO_REJECT_SIMILARITY:
+            return PolicyVerdict(
+                "reject", similarity,
+                f"near-duplicate of rejected post {history[nearest_rejected]['post_id']} "
+                f"(similarity {similarity:.3f})"
+            )
+
+    neighbours = np.argsort(-similarities)[:HITL_POLICY_NEIGHBOURS]
+    neighbours = [i for i in neighbours if similarities[i] >= HITL_AUTO_APPROVE_MIN_SIMILARITY]
+    if len(neighbours) < HITL_AUTO_APPROVE_MIN_NEIGHBOURS:
+        return PolicyVerdict(
+            "review", 0.0,
+            f"only {len(neighbours)} similar reviewed posts (need {HITL_AUTO_APPROVE_MIN_NEIGHBOURS})"
+        )
+
+    weights = np.array([similarities[i] for i in neighbours])
+    votes = np.array([DECISION_WEIGHT[history[i]["decision"]] for i in neighbours])
+    score = float((weights * votes).sum() / weights.sum())
+
+    if score >= HITL_AUTO_APPROVE_SCORE:
+        return PolicyVerdict(
+            "approve", score,
+            f"approval score {score:.3f} over {len(neighbours)} similar posts"
+        )
+
+    return PolicyVerdict("review", score, f"approval score {score:.3f} below threshold")
@@ -0,0 +1,115 @@
+import os
+import re
+import html
+import hashlib
+import db.mentions
+import core.metrics
+import posting.mastodon
+import ingest.threads
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Comma-separated accounts (user or user@domain); allowed accounts skip the other checks
+MENTION_ALLOW_ACCOUNTS = os.getenv("MENTION_ALLOW_ACCOUNTS", "")
+MENTION_DENY_ACCOUNTS = os.getenv("MENTION_DENY_ACCOUNTS", "")
+
+MENTION_ALLOW_BOTS = os.getenv("MENTION_ALLOW_BOTS", "false").lower() == "true"
+MENTION_THREAD_REPLY_CAP = int(os.getenv("MENTION_THREAD_REPLY_CAP", "3"))
+MENTION_DEDUPE_WINDOW = float(os.getenv("MENTION_DEDUPE_WINDOW", str(24 * 3600)))
+MENTION_ACCOUNT_LIMIT = int(os.getenv("MENTION_ACCOUNT_LIMIT", "5"))
+MENTION_ACCOUNT_WINDOW = float(os.getenv("MENTION_ACCOUNT_WINDOW", "3600"))
+
+filter_total = core.metrics.counter("mentions_filtered_total", "Mention filter outcomes", ("outcome",))
+
+def parse_accounts(value: str) -> list[str]:
+    return [a.strip().lstrip("@").lower() for a in value.split(",") if a.strip()]
+
+def normalize_text(content: str) -> str:
+    """Status HTML -> comparable text: no tags, @handles, links, case or extra spaces."""
+    text = html.unescape(re.sub("<.*?>", " ", content))
+    text = re.sub(r"@[\w.@-]+|https?://\S+", " ", text)
+    return " ".join(text.lower().split())
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(normalize_text(content).encode()).hexdigest()
+
+class MentionFilter:
+    """
+    Cheap checks in front of reply generation, so noise mentions never reach
+    the embedding model or the LLM. `check` returns the reason a mention is
+    dropped, or None if it should be handled.
+    """
+
+    def __init__(self):
+        db.mentions.set_account_rules(
+            {a: "deny" for a in parse_accounts(MENTION_DENY_ACCOUNTS)}
+            | {a: "allow" for a in parse_accounts(MENTION_ALLOW_ACCOUNTS)}
+        )
+        self.own_account_id: str | None = None
+        self.counts = Counter()
+
+    async def _own_account_id(self) -> str:
+        if self.own_account_id is None:
+            r = await posting.mastodon.client.request("GET", "/api/v1/accounts/verify_credentials")
+            self.own_account_id = r.json()["id"]
+        return self.own_account_id
+
+    def _reason(self, account: dict, context: dict) -> str | None:
+        if context["rule"] == "deny":
+            return "denied"
+        if context["rule"] == "allow":
+            return None
+        if account.get("bot") and not MENTION_ALLOW_BOTS:
+            return "bot"
+        if context["replied"]:
+            return "already_replied"
+        if context["thread_count"] >= MENTION_THREAD_REPLY_CAP:
+            return "thread_cap"
+        if context["duplicate"]:
+            return "duplicate"
+        if context["account_count"] >= MENTION_ACCOUNT_LIMIT:
+            return "rate_limited"
+        return None
+
+    async def check(self, notification: dict) -> str | None:
+        status = notification.get("status")
+        if not status:
+            return self._count("no_status")
+
+        # A boost carries the original status
+        status = status.get("reblog") or status
+        account = notification.get("account") or status["account"]
+
+        if account["id"] == await self._own_account_id():
+            return self._count("self")
+
+        acct = account["acct"].lower()
+        # Set by the ingester; resolved here when the filter is used on its own
+        thread = notification.get("thread_root") or await ingest.threads.thread_root(status)
+        digest = content_hash(status.get("content", ""))
+
+        context = db.mentions.get_mention_context(
+            notification["id"], acct, thread, digest, str(status["id"]),
+            MENTION_ACCOUNT_WINDOW, MENTION_DEDUPE_WINDOW,
+        )
+        if previous := context["previous"]:
+            # Re-fetched after a restart before it was handled: keep the first decision
+            # (its own row would otherwise make it a duplicate and count against the limits)
+            if previous["accepted"] and context["replied"]:
+                return "already_replied"
+            return previous["reason"]
+
+        reason = self._reason(account, context)
+
+        db.mentions.record_mention(notification["id"], acct, thread, digest, reason)
+        return self._count(reason)
+
+    def _count(self, reason: str | None) -> str | None:
+        self.counts[reason or "accepted"] += 1
+        filter_total.inc(outcome=reason or "accepted")
+        return reason
+
+    def stats(self) -> dict:
+        return dict(self.counts)
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import asyncio
+import httpx
+import db.state
+import db.notifications
+import posting.mastodon
+import ingest.threads
+from collections import deque
+from ingest.workers import WorkerPool
+from ingest.filters import MentionFilter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "stream" consumes the streaming API and falls back to polling; "poll" only polls
+MASTODON_INGEST_MODE = os.getenv("MASTODON_INGEST_MODE", "stream")
+# Defaults to the API host; some instances serve streaming from a separate host
+MASTODON_STREAMING_URL = os.getenv("MASTODON_STREAMING_URL") or os.getenv("MASTODON_API_URL") or ""
+
+# Mastodon sends a heartbeat comment every ~15s, so a silent connection is dead
+STREAM_READ_TIMEOUT = float(os.getenv("MASTODON_STREAM_READ_TIMEOUT", "60"))
+STREAM_MAX_FAILURES = int(os.getenv("MASTODON_STREAM_MAX_FAILURES", "3"))
+STREAM_RETRY_SECONDS = float(os.getenv("MASTODON_STREAM_RETRY_SECONDS", "300"))
+
+# Adaptive polling: fast while notifications arrive, backing off when idle
+POLL_MIN_SECONDS = float(os.getenv("MASTODON_POLL_MIN_SECONDS", "5"))
+POLL_MAX_SECONDS = float(os.getenv("MASTODON_POLL_MAX_SECONDS", "60"))
+
+# Handled notifications are written to the ledger (and the cursor advanced) in batches
+CHECKPOINT_BATCH_SIZE = int(os.getenv("NOTIFICATION_CHECKPOINT_BATCH_SIZE", "20"))
+CHECKPOINT_SECONDS = float(os.getenv("NOTIFICATION_CHECKPOINT_SECONDS", "5"))
+
+# A failing mention is retried (doubling the delay) before it is recorded as failed;
+# until then the cursor stays behind it, so a restart re-fetches it
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "3"))
+NOTIFICATION_RETRY_SECONDS = float(os.getenv("NOTIFICATION_RETRY_SECONDS", "30"))
+
+# Largest page the notifications endpoint returns
+PAGE_SIZE = 80
+
+CURSOR_KEY = "mastodon_last_seen"
+
+def notification_id(notification: dict) -> int:
+    """Mastodon ids are numeric strings that sort by creation time."""
+    return int(notification["id"])
+
+async def read_events(resp: httpx.Response):
+    """Parse a server-sent events body into (event, data) pairs."""
+    event, data = None, []
+    async for line in resp.aiter_lines():
+        if not line:
+            if data:
+                yield event or "message", "\n".join(data)
+            event, data = None, []
+        elif line.startswith(":"):
+            continue  # heartbeat
+        else:
+            field, _, value = line.partition(":")
+            value = value.removeprefix(" ")
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+
+# -------------------- Checkpoints --------------------
+class Checkpointer:
+    """
+    Tracks notifications from dispatch until they are handled.
+
+    The cursor only advances past a notification once it and every earlier one
+    are done, so a crash re-fetches unfinished work instead of losing it.
+    Notifications that finished out of order are in the ledger and skipped.
+    """
+
+    def __init__(self, cursor: str | None):
+        self.cursor = cursor
+        self.dispatched: deque[str] = deque()  # in dispatch (= id) order
+        self.done: set[str] = set()
+        self.records: list[dict] = []
+        self.last_flush = time.monotonic()
+
+    def start(self, notification: dict):
+        self.dispatched.append(notification["id"])
+
+    def finish(self, notification: dict, outcome: str):
+        self.done.add(notification["id"])
+        self.records.append({"id": notification["id"], "type": notification["type"], "outcome": outcome})
+        if len(self.records) >= CHECKPOINT_BATCH_SIZE:
+            self.flush()
+
+    def skip(self, notification: dict):
+        """Already in the ledger; only lets the cursor move past it."""
+        self.dispatched.append(notification["id"])
+        self.done.add(notification["id"])
+
+    def flush(self):
+        # Advance over the contiguous run of finished notifications
+        cursor = None
+        while self.dispatched and self.dispatched[0] in self.done:
+            cursor = self.dispatched.popleft()
+            self.done.discard(cursor)
+
+        if not self.records and cursor is None:
+            return
+
+        db.notifications.checkpoint(self.records, CURSOR_KEY, cursor)
+        if cursor is not None:
+            self.cursor = cursor
+        self.records = []
+        self.last_flush = time.monotonic()
+
+    async def run(self):
+        """Flush periodically so a quiet stream still persists its progress."""
+        while True:
+            await asyncio.sleep(CHECKPOINT_SECONDS)
+            if time.monotonic() - self.last_flush >= CHECKPOINT_SECONDS:
+                self.flush()
+
+# -------------------- Ingestion --------------------
+class NotificationIngester:
+    """
+    Feeds Mastodon notifications to the worker pool, in order and once each.
+
+    Prefers the streaming API (user:notification), so mentions arrive as soon
+    as they are created. Every (re)connect first catches up on whatever was
+    missed since the cursor. If streaming keeps failing, falls back to adaptive
+    polling and retries streaming every STREAM_RETRY_SECONDS.
+    """
+
+    def __init__(self, pool: WorkerPool, types: tuple[str, ...] = ("mention",),
+                 mode: str = MASTODON_INGEST_MODE, mention_filter: MentionFilter | None = None):
+        self.pool = pool
+        self.types = types
+        self.filter = mention_filter
+        self.mode = mode
+        self.client = posting.mastodon.client
+        self.checkpoints = Checkpointer(db.state.get(CURSOR_KEY))
+        self.last_dispatched_id = int(self.checkpoints.cursor or 0)
+        self.stream_failures = 0
+        self.attempts: dict[str, int] = {}
+        self.retries: set[asyncio.Task] = set()
+
+    def _on_done(self, notification: dict, error: Exception | None):
+        if error is None:
+            self.attempts.pop(notification["id"], None)
+            self.checkpoints.finish(notification, "handled")
+            return
+
+        attempts = self.attempts.get(notification["id"], 0) + 1
+        if attempts >= NOTIFICATION_MAX_ATTEMPTS:
+            self.attempts.pop(notification["id"], None)
+            print(f"Giving up on notification {notification['id']} after {attempts} attempts")
+            self.checkpoints.finish(notification, "failed")
+            return
+
+        self.attempts[notification["id"]] = attempts
+        task = asyncio.create_task(self._retry(notification, NOTIFICATION_RETRY_SECONDS * 2 ** (attempts - 1)))
+        self.retries.add(task)
+        task.add_done_callback(self.retries.discard)
+
+    async def _retry(self, notification: dict, delay: float):
+        await asyncio.sleep(delay)
+        await self.pool.submit(notification, on_done=self._on_done)
+
+    async def dispatch(self, notification: dict, processed: set[str] | None = None):
+        # Catch-up and stream can overlap around a reconnect
+        if notification_id(notification) <= self.last_dispatched_id:
+            return
+        self.last_dispatched_id = notification_id(notification)
+
+        if processed is None:
+            processed = db.notifications.get_processed_ids([notification["id"]])
+        if notification["id"] in processed:
+            # Handled before a restart, after the last checkpoint
+            self.checkpoints.skip(notification)
+            return
+
+        self.checkpoints.start(notification)
+        if notification["type"] not in self.types:
+            self.checkpoints.finish(notification, "ignored")
+            return
+
+        if status := notification.get("status"):
+            # Filter and worker pool both key on the thread
+            notification["thread_root"] = await ingest.threads.thread_root(status.get("reblog") or status)
+
+        if self.filter and (reason := await self.filter.check(notification)):
+            self.checkpoints.finish(notification, f"filtered:{reason}")
+            return
+
+        await self.pool.submit(notification, on_done=self._on_done)
+
+    # -------------------- Polling --------------------
+    async def catch_up(self) -> int:
+        """
+        Fetch every notification newer than what was dispatched, oldest page
+        first, following the Link headers; returns how many were new.
+        """
+        count = 0
+        url = "/api/v1/notifications"
+        params = {"limit": PAGE_SIZE}
+        if self.last_dispatched_id:
+            params["min_id"] = str(self.last_dispatched_id)
+
+        while url:
+            r = await self.client.request("GET", url, params=params)
+            notifs = r.json()
+            if not notifs:
+                break
+
+            processed = db.notifications.get_processed_ids([n["id"] for n in notifs])
+            for n in reversed(notifs):
+                await self.dispatch(n, processed)
+            count += len(notifs)
+            if len(notifs) < PAGE_SIZE:
+                break
+
+            # With min_id, rel="prev" points at the next newer page
+            url = r.links.get("prev", {}).get("url")
+            params = None
+
+        return count
+
+    async def poll(self, until: float | None = None):
+        """Poll with an interval that halves on activity and doubles when idle."""
+        interval = POLL_MIN_SECONDS
+        while until is None or time.monotonic() < until:
+            try:
+                count = await self.catch_up()
+            except httpx.HTTPError as e:
+                print(f"Notification poll failed: {e}")
+                count = 0
+
+            if count:
+                interval = max(POLL_MIN_SECONDS, interval / 2)
+            else:
+                interval = min(POLL_MAX_SECONDS, interval * 2)
+            await asyncio.sleep(interval)
+
+    # -------------------- Streaming --------------------
+    async def stream(self):
+        """Consume one streaming connection until it drops."""
+        url = f"{MASTODON_STREAMING_URL.rstrip('/')}/api/v1/streaming/user/notification"
+        timeout = httpx.Timeout(posting.mastodon.MASTODON_TIMEOUT, read=STREAM_READ_TIMEOUT)
+
+        async with posting.mastodon.get_http_client().stream("GET", url, timeout=timeout) as resp:
+            resp.raise_for_status()
+            print("Connected to Mastodon streaming API")
+
+            # Anything created while we were disconnected
+            await self.catch_up()
+            self.stream_failures = 0
+
+            async for event, data in read_events(resp):
+                if event == "notification":
+                    await self.dispatch(json.loads(data))
+
+    async def _ingest(self):
+        if self.mode == "poll":
+            await self.poll()
+            return
+
+        while True:
+            try:
+                await self.stream()
+                print("Mastodon stream closed, reconnecting")
+            except (httpx.HTTPError, json.JSONDecodeError) as e:
+                self.stream_failures += 1
+                print(f"Mastodon stream failed ({self.stream_failures}/{STREAM_MAX_FAILURES}): {e!r}")
+
+            if self.stream_failures >= STREAM_MAX_FAILURES:
+                print(f"Streaming unavailable, polling for {STREAM_RETRY_SECONDS:g}s")
+                await self.poll(until=time.monotonic() + STREAM_RETRY_SECONDS)
+                self.stream_failures = 0
+            else:
+                await asyncio.sleep(min(2 ** self.stream_failures, 30))
+
+    async def run(self):
+        checkpoint_task = asyncio.create_task(self.checkpoints.run())
+        try:
+            await self._ingest()
+        finally:
+            checkpoint_task.cancel()
+            for task in self.retries:
+                task.cancel()
+            self.checkpoints.flush()
@@ -0,0 +1,56 @@
+import os
+import httpx
+import posting.mastodon
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# status id -> id of the first status of its thread, for replies seen recently
+THREAD_CACHE_SIZE = int(os.getenv("MENTION_THREAD_CACHE_SIZE", "10000"))
+
+_roots: "OrderedDict[str, str]" = OrderedDict()
+
+def _remember(status_id: str, root: str):
+    _roots[status_id] = root
+    _roots.move_to_end(status_id)
+    while len(_roots) > THREAD_CACHE_SIZE:
+        _roots.popitem(last=False)
+
+async def thread_root(status: dict) -> str:
+    """
+    Id of the status that started the thread. Mastodon statuses only carry
+    in_reply_to_id (there is no conversation id), so replies further down
+    are resolved through /api/v1/statuses/:id/context, once per thread.
+    """
+    status_id = str(status["id"])
+    parent = status.get("in_reply_to_id")
+    if not parent:
+        _remember(status_id, status_id)
+        return status_id
+
+    root = _roots.get(str(parent))
+    if root is None:
+        try:
+            r = await posting.mastodon.client.request("GET", f"/api/v1/statuses/{status_id}/context")
+            ancestors = r.json()["ancestors"]  # oldest first
+        except httpx.HTTPError as e:
+            print(f"Could not resolve the thread of status {status_id}: {e}")
+            return str(parent)
+
+        root = str(ancestors[0]["id"]) if ancestors else str(parent)
+        for ancestor in ancestors:
+            _remember(str(ancestor["id"]), root)
+
+    _remember(status_id, root)
+    return root
+
+def thread_key(notification: dict) -> str:
+    """The thread a notification belongs to (set by the ingester as "thread_root")."""
+    status = notification.get("status") or {}
+    return str(
+        notification.get("thread_root")
+        or status.get("in_reply_to_id")
+        or status.get("id")
+        or notification["id"]
+    )
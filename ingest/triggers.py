@@ -0,0 +1,136 @@
+import os
+import asyncio
+import numpy as np
+from collections import defaultdict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# After a signal, wait until it has been quiet this long so a burst becomes one batch
+TRIGGER_DEBOUNCE_SECONDS = float(os.getenv("TRIGGER_DEBOUNCE_SECONDS", "5"))
+# ...but never delay the first signal by more than this
+TRIGGER_MAX_DELAY_SECONDS = float(os.getenv("TRIGGER_MAX_DELAY_SECONDS", "30"))
+# Check the table anyway every so often (e.g. triggers inserted by another process)
+TRIGGER_FALLBACK_SECONDS = float(os.getenv("TRIGGER_FALLBACK_SECONDS", str(15 * 60)))
+
+# Token budget for the knowledge passed to one generate_post call
+TRIGGER_BATCH_TOKENS = int(os.getenv("TRIGGER_BATCH_TOKENS", "2000"))
+# Pages whose changes are at least this similar are treated as one topic
+TRIGGER_TOPIC_SIMILARITY = float(os.getenv("TRIGGER_TOPIC_SIMILARITY", "0.6"))
+
+# Rough tokens-per-character for English text; avoids shipping a tokenizer
+CHARS_PER_TOKEN = 4
+
+class TriggerSignal:
+    """
+    In-process notification that new notion_triggers rows exist.
+
+    The Notion sync calls notify() after inserting triggers; the trigger
+    processor waits on wait(), which coalesces a burst of signals into one
+    wake-up.
+    """
+
+    def __init__(self, debounce: float = TRIGGER_DEBOUNCE_SECONDS,
+                 max_delay: float = TRIGGER_MAX_DELAY_SECONDS,
+                 fallback: float = TRIGGER_FALLBACK_SECONDS):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.fallback = fallback
+        self.event = asyncio.Event()
+        self.pending = 0
+
+    def notify(self, count: int = 1):
+        self.pending += count
+        self.event.set()
+
+    async def wait(self) -> int:
+        """
+        Wait for signals and return how many were coalesced (0 when woken by
+        the fallback timer).
+        """
+        try:
+            await asyncio.wait_for(self.event.wait(), self.fallback)
+        except asyncio.TimeoutError:
+            return 0
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while True:
+            self.event.clear()
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self.event.wait(), min(self.debounce, remaining))
+            except asyncio.TimeoutError:
+                break  # quiet for a full debounce window
+
+        count, self.pending = self.pending, 0
+        self.event.clear()
+        return count
+
+# -------------------- Batching --------------------
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def page_id(trigger: dict) -> str:
+    """Chunk source ids look like "<page_id>::chunk_<n>"."""
+    return trigger["source_id"].split("::")[0]
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+def cluster_pages(triggers: list[dict], similarity: float = TRIGGER_TOPIC_SIMILARITY) -> list[list[dict]]:
+    """
+    Group triggers by page, then merge pages about the same topic: each page
+    joins the first cluster whose centroid is at least `similarity` close.
+    Pages without embeddings stay on their own.
+    """
+    pages = defaultdict(list)
+    for t in triggers:
+        pages[page_id(t)].append(t)
+
+    # Most significant pages seed the clusters
+    ordered = sorted(pages.values(), key=lambda ts: -max(t["score"] or 0 for t in ts))
+
+    clusters: list[tuple[np.ndarray | None, list[dict]]] = []
+    for page_triggers in ordered:
+        vectors = [np.frombuffer(t["embedding"], dtype=np.float32) for t in page_triggers if t["embedding"]]
+        centroid = _unit(np.mean(vectors, axis=0)) if vectors else None
+
+        for i, (cluster_centroid, members) in enumerate(clusters):
+            if centroid is None or cluster_centroid is None:
+                continue
+            if float(np.dot(centroid, cluster_centroid)) >= similarity:
+                members.extend(page_triggers)
+                clusters[i] = (_unit(cluster_centroid * (len(members) - len(page_triggers))
+                                     + centroid * len(page_triggers)), members)
+                break
+        else:
+            clusters.append((centroid, list(page_triggers)))
+
+    return [members for _, members in clusters]
+
+def plan_batches(triggers: list[dict], max_tokens: int = TRIGGER_BATCH_TOKENS) -> list[list[dict]]:
+    """
+    Split pending triggers into coherent, size-capped batches: one topic per
+    batch, each under `max_tokens` of diff text, most significant first.
+    A single diff over the budget is truncated rather than dropped.
+    """
+    batches = []
+    for cluster in cluster_pages(triggers):
+        batch, tokens = [], 0
+        for t in sorted(cluster, key=lambda t: (page_id(t), t["created_at"], t["id"])):
+            if estimate_tokens(t["diff"]) > max_tokens:
+                t = {**t, "diff": t["diff"][:max_tokens * CHARS_PER_TOKEN]}
+
+            cost = estimate_tokens(t["diff"])
+            if batch and tokens + cost > max_tokens:
+                batches.append(batch)
+                batch, tokens = [], 0
+            batch.append(t)
+            tokens += cost
+        if batch:
+            batches.append(batch)
+
+    return sorted(batches, key=lambda b: -max(t["score"] or 0 for t in b))
@@ -0,0 +1,126 @@
+import os
+import time
+import asyncio
+import core.metrics
+from collections import deque
+from typing import Awaitable, Callable
+from ingest.threads import thread_key
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MENTION_WORKERS = int(os.getenv("MENTION_WORKERS", "4"))
+# Once this many mentions are queued or in flight, submit() waits (backpressure on ingestion)
+MENTION_QUEUE_LIMIT = int(os.getenv("MENTION_QUEUE_LIMIT", "200"))
+
+handled_total = core.metrics.counter("mentions_handled_total", "Mentions handled by the worker pool", ("outcome",))
+queue_wait = core.metrics.histogram("mention_queue_wait_seconds", "Time a mention waits for a worker")
+
+Handler = Callable[[dict], Awaitable[None]]
+# Called with the item and the handler's exception (None on success)
+DoneCallback = Callable[[dict, Exception | None], None]
+
+class WorkerPool:
+    """
+    A fixed number of workers draining per-thread queues.
+
+    Different threads are processed concurrently, so one slow LLM call
+    or pending approval no longer holds up every later mention; items with the
+    same key keep their order. At most `limit` items are queued or in flight.
+    """
+
+    def __init__(self, handler: Handler, workers: int = MENTION_WORKERS,
+                 limit: int = MENTION_QUEUE_LIMIT, key: Callable[[dict], str] = thread_key):
+        self.handler = handler
+        self.workers = workers
+        self.key = key
+        self.capacity = asyncio.Semaphore(limit)
+        self.limit = limit
+
+        self.pending: dict[str, deque] = {}  # key -> (enqueued_at, item, on_done) for every active conversation
+        self.ready: asyncio.Queue[str] = asyncio.Queue()
+        self.tasks: list[asyncio.Task] = []
+
+        self.queued = 0
+        self.in_flight = 0
+        self.max_depth = 0
+        self.processed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.backpressure_waits = 0
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def submit(self, item: dict, on_done: DoneCallback | None = None):
+        """Queue an item; waits while the pool is full. `on_done` runs once it is handled."""
+        if self.capacity.locked():
+            self.backpressure_waits += 1
+            print(f"Mention queue full ({self.limit}), pausing ingestion")
+        await self.capacity.acquire()
+
+        key = self.key(item)
+        if key not in self.pending:
+            self.pending[key] = deque()
+            self.ready.put_nowait(key)
+        self.pending[key].append((time.monotonic(), item, on_done))
+
+        self.queued += 1
+        self.max_depth = max(self.max_depth, self.queued + self.in_flight)
+
+    async def _worker(self):
+        while True:
+            key = await self.ready.get()
+            items = self.pending[key]
+            enqueued_at, item, on_done = items.popleft()
+
+            self.queued -= 1
+            self.in_flight += 1
+            waited = time.monotonic() - enqueued_at
+            self.total_wait += waited
+            queue_wait.observe(waited)
+            try:
+                error = None
+                try:
+                    await self.handler(item)
+                    self.processed += 1
+                    handled_total.inc(outcome="ok")
+                except Exception as e:
+                    error = e
+                    self.failed += 1
+                    handled_total.inc(outcome="error")
+                    print(f"Mention handler failed for {key}: {e!r}")
+
+                # Not reached on cancellation, so an interrupted item is never reported as done
+                if on_done:
+                    on_done(item, error)
+            finally:
+                self.in_flight -= 1
+                self.capacity.release()
+
+                # Hand the conversation back only once this item is done
+                if items:
+                    self.ready.put_nowait(key)
+                else:
+                    del self.pending[key]
+
+    def stats(self) -> dict:
+        handled = self.processed + self.failed
+        return {
+            "workers": self.workers,
+            "limit": self.limit,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "conversations": len(self.pending),
+            "max_depth": self.max_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "backpressure_waits": self.backpressure_waits,
+            "avg_wait_seconds": round(self.total_wait / handled, 3) if handled else 0.0,
+        }
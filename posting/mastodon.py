@@ -0,0 +1,202 @@
+import os
+import time
+import uuid
+import asyncio
+import httpx
+import core.metrics
+import core.tracing
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Mastodon API Configuration
+MASTODON_API_URL = os.getenv("MASTODON_API_URL")
+MASTODON_ACCESS_TOKEN = os.getenv("MASTODON_ACCESS_TOKEN")
+
+# Mastodon allows 300 requests per 5 minutes per account by default
+MASTODON_RATE_LIMIT = int(os.getenv("MASTODON_RATE_LIMIT", "300"))
+MASTODON_RATE_WINDOW = float(os.getenv("MASTODON_RATE_WINDOW", "300"))
+MASTODON_MAX_RETRIES = int(os.getenv("MASTODON_MAX_RETRIES", "4"))
+MASTODON_TIMEOUT = float(os.getenv("MASTODON_TIMEOUT", "30"))
+MASTODON_MEDIA_TIMEOUT = float(os.getenv("MASTODON_MEDIA_TIMEOUT", "60"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# -------------------- Metrics --------------------
+request_seconds = core.metrics.histogram("mastodon_request_seconds", "Mastodon API request latency", ("method",))
+requests_total = core.metrics.counter(
+    "mastodon_requests_total", "Mastodon API responses by status (\"error\" for transport errors)", ("method", "status")
+)
+
+# -------------------- Shared HTTP client --------------------
+_http_client: httpx.AsyncClient | None = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """One pooled client for every Mastodon call (polling and publishing)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url=MASTODON_API_URL or "",
+            headers={"Authorization": f"Bearer {MASTODON_ACCESS_TOKEN}"},
+            timeout=MASTODON_TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# -------------------- Rate limiting --------------------
+class TokenBucket:
+    """
+    Client-side token bucket kept in sync with Mastodon's
+    X-RateLimit-Remaining / X-RateLimit-Reset headers.
+    """
+
+    def __init__(self, capacity: int, window: float):
+        self.capacity = capacity
+        self.rate = capacity / window
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.resume_at:
+                    await asyncio.sleep(self.resume_at - now)
+                    continue
+
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause_until(self, delay: float):
+        self.resume_at = max(self.resume_at, time.monotonic() + delay)
+
+    def sync(self, headers: httpx.Headers):
+        """Never assume more budget than the server says is left."""
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is None:
+            return
+
+        self._refill()
+        self.tokens = min(self.tokens, float(remaining))
+        if float(remaining) < 1:
+            self.pause_until(reset_delay(headers))
+
+def reset_delay(headers: httpx.Headers, default: float = 5.0) -> float:
+    """Seconds until the rate-limit window resets, from X-RateLimit-Reset or Retry-After."""
+    reset = headers.get("X-RateLimit-Reset")
+    if reset:
+        try:
+            reset_at = datetime.fromisoformat(reset.replace("Z", "+00:00"))
+            return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+        except ValueError:
+            pass
+
+    retry_after = headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+
+    return default
+
+# -------------------- Client --------------------
+class MastodonClient:
+    def __init__(self):
+        self.bucket = TokenBucket(MASTODON_RATE_LIMIT, MASTODON_RATE_WINDOW)
+
+    async def request(self, method: str, path: str, idempotency_key: str | None = None, **kwargs) -> httpx.Response:
+        """
+        Rate-limited request with retries on 429, 5xx and transport errors.
+
+        Non-idempotent calls should pass an idempotency_key so that a retry
+        after a lost response can't create a duplicate.
+        """
+        headers = dict(kwargs.pop("headers", {}) or {})
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+
+        for attempt in range(MASTODON_MAX_RETRIES + 1):
+            await self.bucket.acquire()
+            try:
+                with request_seconds.time(method=method):
+                    resp = await get_http_client().request(method, path, headers=headers, **kwargs)
+            except httpx.TransportError:
+                requests_total.inc(method=method, status="error")
+                if attempt == MASTODON_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            requests_total.inc(method=method, status=resp.status_code)
+            self.bucket.sync(resp.headers)
+
+            if resp.status_code in RETRY_STATUSES and attempt < MASTODON_MAX_RETRIES:
+                if resp.status_code == 429:
+                    delay = reset_delay(resp.headers)
+                    self.bucket.pause_until(delay)
+                    await asyncio.sleep(delay)
+                else:
+                    await asyncio.sleep(2 ** attempt)
+                continue
+
+            resp.raise_for_status()
+            return resp
+
+    @core.tracing.traced("mastodon.upload_media")
+    async def upload_media(self, data: bytes, filename: str) -> dict:
+        """
+        Upload through the asynchronous /api/v2/media endpoint and wait until
+        Mastodon has finished processing the attachment.
+        """
+        resp = await self.request(
+            "POST", "/api/v2/media",
+            files={"file": (filename, data)},
+        )
+        media = resp.json()
+
+        # 202 on upload / 206 on fetch mean the file is still being processed
+        delay = 0.25
+        deadline = time.monotonic() + MASTODON_MEDIA_TIMEOUT
+        while resp.status_code in (202, 206) or media.get("url") is None:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Media {media['id']} still processing after {MASTODON_MEDIA_TIMEOUT:g}s")
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 2.0)
+            resp = await self.request("GET", f"/api/v1/media/{media['id']}")
+            media = resp.json()
+
+        return media
+
+    @core.tracing.traced("mastodon.create_status")
+    async def create_status(self, status: str, media_ids: list[str] | None = None,
+                            in_reply_to_id: str | None = None, idempotency_key: str | None = None) -> dict:
+        payload = {"status": status}
+        if media_ids:
+            payload["media_ids[]"] = media_ids
+        if in_reply_to_id:
+            payload["in_reply_to_id"] = in_reply_to_id
+
+        resp = await self.request(
+            "POST", "/api/v1/statuses",
+            idempotency_key=idempotency_key or str(uuid.uuid4()),
+            data=payload,
+        )
+        return resp.json()
+
+client = MastodonClient()
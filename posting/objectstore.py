@@ -0,0 +1,127 @@
+import io
+import os
+import hashlib
+import mimetypes
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Object store configuration
+OBJECT_STORE_BACKEND = os.getenv("OBJECT_STORE_BACKEND", "gcs")  # "gcs" or "local"
+GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "sundai-bucket")
+LOCAL_STORE_DIR = os.getenv("LOCAL_STORE_DIR", "/tmp/object-store")
+LOCAL_STORE_BASE_URL = os.getenv("LOCAL_STORE_BASE_URL")
+
+# Files above this size are sent in chunks (GCS resumable upload); must be a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+RESUMABLE_THRESHOLD = 8 * 1024 * 1024
+
+# -------------------- Keys --------------------
+def content_key(data: bytes, extension: str, prefix: str = "images") -> str:
+    """Content-addressed key: identical bytes always map to the same object."""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{prefix}/{digest[:2]}/{digest}{extension}"
+
+# -------------------- Backends --------------------
+class ObjectStore(ABC):
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, stream: BinaryIO, size: int, content_type: str | None = None) -> str:
+        """Upload `size` bytes from `stream` under `key` and return the public URL."""
+
+class GCSObjectStore(ObjectStore):
+    def __init__(self, bucket_name: str = GCS_BUCKET_NAME):
+        # Imported here so the local backend works without the Google SDK
+        from google.cloud import storage
+
+        self.client = storage.Client()
+        self.bucket = self.client.bucket(bucket_name)
+
+    def exists(self, key: str) -> bool:
+        return self.bucket.blob(key).exists()
+
+    def url(self, key: str) -> str:
+        return self.bucket.blob(key).public_url
+
+    def put(self, key: str, stream: BinaryIO, size: int, content_type: str | None = None) -> str:
+        blob = self.bucket.blob(key)
+        if size > RESUMABLE_THRESHOLD:
+            # Setting a chunk size makes the client use a resumable, chunked upload
+            blob.chunk_size = UPLOAD_CHUNK_SIZE
+
+        blob.upload_from_file(stream, size=size, content_type=content_type)
+        blob.make_public()
+        return blob.public_url
+
+class LocalObjectStore(ObjectStore):
+    """Filesystem stand-in for running and benchmarking the publishing path offline."""
+
+    def __init__(self, root: str = LOCAL_STORE_DIR, base_url: str | None = LOCAL_STORE_BASE_URL):
+        self.root = Path(root)
+        self.base_url = base_url
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def url(self, key: str) -> str:
+        if self.base_url:
+            return f"{self.base_url.rstrip('/')}/{key}"
+        return self._path(key).resolve().as_uri()
+
+    def put(self, key: str, stream: BinaryIO, size: int, content_type: str | None = None) -> str:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write in chunks to a temporary file and rename, so readers never see a partial object
+        tmp_path = path.with_name(path.name + ".part")
+        with open(tmp_path, "wb") as f:
+            while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+
+        return self.url(key)
+
+_object_store: ObjectStore | None = None
+
+def get_object_store() -> ObjectStore:
+    global _object_store
+    if _object_store is None:
+        if OBJECT_STORE_BACKEND == "local":
+            _object_store = LocalObjectStore()
+        elif OBJECT_STORE_BACKEND == "gcs":
+            _object_store = GCSObjectStore()
+        else:
+            raise ValueError(f"Unknown OBJECT_STORE_BACKEND: {OBJECT_STORE_BACKEND}")
+    return _object_store
+
+def set_object_store(store: ObjectStore):
+    """Swap the backend (benchmarks, local runs)."""
+    global _object_store
+    _object_store = store
+
+# -------------------- Images --------------------
+def store_image(data: bytes, extension: str = ".webp") -> str:
+    """
+    Store image bytes under their content hash and return the public URL.
+    Images that are already stored are not uploaded again.
+    """
+    store = get_object_store()
+    key = content_key(data, extension)
+    if store.exists(key):
+        return store.url(key)
+
+    content_type = mimetypes.guess_type(key)[0]
+    return store.put(key, io.BytesIO(data), len(data), content_type)
@@ -1,81 +1,102 @@
 import os
-import requests
+import time
+import asyncio
 import db.posts
+import core.metrics
+import core.tracing
 from core.models import Post
-from google.cloud import storage
+from core.media import ImageBuffer
+from posting.mastodon import client as mastodon
+from posting.objectstore import store_image
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Mastodon API Configuration
-MASTODON_API_URL = os.getenv("MASTODON_API_URL")
-MASTODON_ACCESS_TOKEN = os.getenv("MASTODON_ACCESS_TOKEN")
-
-# Google Cloud Storage
-BUCKET_NAME = "sundai-bucket"
+post_seconds = core.metrics.histogram(
+    "mastodon_post_seconds", "Time to publish a post (media upload + status)", ("type", "outcome")
+)
+
+# Archival uploads still running in the background
+_archive_tasks: set[asyncio.Task] = set()
+
+# -------------------- Archival --------------------
+async def archive_image(post: Post, image_data: bytes, extension: str):
+    """Copy the image to the object store and record its URL."""
+    try:
+        with core.tracing.span("objectstore.archive", bytes=len(image_data)):
+            img_url = await asyncio.to_thread(store_image, image_data, extension)
+        post.img_url = img_url
+        db.posts.update_post_img_url(post.id, img_url)
+    except Exception as e:
+        print(f"Failed to archive image for post {post.id}: {e}")
+
+async def wait_for_archives():
+    """Let in-flight archival uploads finish (used on shutdown)."""
+    if _archive_tasks:
+        await asyncio.gather(*_archive_tasks, return_exceptions=True)
 
 # -------------------- Mastodon --------------------
-def upload_image_to_gcloud(local_path: str, destination_blob_name: str) -> str:
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-    blob = bucket.blob(destination_blob_name)
-    blob.upload_from_filename(local_path)
-    blob.make_public()
-    return blob.public_url
-
-def post_to_mastodon(post: Post):
-    headers = {
-        "Authorization": f"Bearer {MASTODON_ACCESS_TOKEN}"
-    }
+async def post_to_mastodon(post: Post):
+    start = time.perf_counter()
+    try:
+        with core.tracing.span("mastodon.publish", post_id=post.id, type=post.type):
+            data = await _post_to_mastodon(post)
+    except Exception:
+        post_seconds.observe(time.perf_counter() - start, type=post.type, outcome="error")
+        raise
+    post_seconds.observe(time.perf_counter() - start, type=post.type, outcome="ok")
+    return data
 
+async def _post_to_mastodon(post: Post):
     media_id = None
-    if post.type == "image" and post.image_path:
-        media_url = f"{MASTODON_API_URL}/api/v1/media"
-        with open(post.image_path, "rb") as img_file:
-            files = {"file": img_file}
-            media_resp = requests.post(media_url, headers=headers, files=files)
-            media_resp.raise_for_status()
-            media_id = media_resp.json()["id"]
-
-        gcs_url = upload_image_to_gcloud(
-            post.image_path, os.path.basename(post.image_path)
-        )
-        post.img_url = gcs_url
-        db.posts.update_post_img_url(post.id, gcs_url)
-
-        try:
-            os.remove(post.image_path)
-        except PermissionError:
-            pass
+    image = post.image
+    if image is None and post.type == "image" and post.image_path:
+        image = ImageBuffer.from_file(post.image_path)
+
+    if post.type == "image" and image is not None:
+        # Read once; both uploads share the same bytes and the buffer can go
+        image_data = image.getvalue()
+        extension = image.extension
+        image.close()
+
+        # The archival copy runs alongside the Mastodon upload and never delays the status
+        archive = asyncio.create_task(archive_image(post, image_data, extension))
+        _archive_tasks.add(archive)
+        archive.add_done_callback(_archive_tasks.discard)
+
+        media = await mastodon.upload_media(image_data, f"post-{post.id}{extension}")
+        media_id = media["id"]
 
     # ----------------- Reply logic -----------------
+    # Reply drafts store the Mastodon id of the status they answer
     in_reply_to_id = None
     if post.type == "reply":
-        parent = db.posts.get_post(post.parent_post_id)
-        if not parent or not parent.mastodon_status_id:
-            raise ValueError("Cannot reply: parent post not found or not posted")
+        if not post.parent_post_id:
+            raise ValueError("Cannot reply: parent status id is missing")
 
-        in_reply_to_id = parent.mastodon_status_id
+        in_reply_to_id = str(post.parent_post_id)
     # ------------------------------------------------
 
-    post_url = f"{MASTODON_API_URL}/api/v1/statuses"
-    payload = {
-        "status": post.final_content or post.original_content
-    }
-
-    if media_id:
-        payload["media_ids[]"] = [media_id]
-
-    if in_reply_to_id:
-        payload["in_reply_to_id"] = in_reply_to_id
-
-    response = requests.post(post_url, headers=headers, data=payload)
-    response.raise_for_status()
-
-    data = response.json()
+    data = await mastodon.create_status(
+        post.final_content or post.original_content,
+        media_ids=[media_id] if media_id else None,
+        in_reply_to_id=in_reply_to_id,
+        # Stable per post, so a retried publish can never create a second status
+        idempotency_key=f"post-{post.id}",
+    )
 
     # Persist Mastodon ID for future replies
     db.posts.update_post_posted_at(post.id)
     db.posts.update_post_mastodon_id(post.id, data["id"])
 
     return data
+
+async def post_many_to_mastodon(posts: list[Post]) -> list:
+    """
+    Publish several approved posts concurrently. The shared token bucket keeps the
+    burst within Mastodon's rate limit; failures are returned, not raised.
+    """
+    return await asyncio.gather(
+        *(post_to_mastodon(post) for post in posts),
+        return_exceptions=True,
+    )
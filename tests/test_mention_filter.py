@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+import db.schema
+import ingest.filters
+import ingest.threads
+import posting.mastodon
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+@pytest.fixture
+def mention_filter(tmp_path, monkeypatch):
+    monkeypatch.setattr(db.schema, "DB_FILE", str(tmp_path / "test.db"))
+    # The filter never touches embeddings, so no sqlite-vec extension is needed
+    db.schema.init_db(vector=False)
+
+    # Status 10 starts the thread; everything else replies somewhere below it
+    async def request(method, path, **kwargs):
+        if path == "/api/v1/accounts/verify_credentials":
+            return FakeResponse({"id": "1"})
+        if path.endswith("/context"):
+            return FakeResponse({"ancestors": [{"id": "10"}]})
+        raise AssertionError(f"unexpected request {method} {path}")
+
+    monkeypatch.setattr(posting.mastodon.client, "request", request)
+    monkeypatch.setattr(ingest.threads, "_roots", ingest.threads.OrderedDict())
+    monkeypatch.setattr(ingest.filters, "MENTION_THREAD_REPLY_CAP", 1)
+    return ingest.filters.MentionFilter()
+
+def mention(notification_id: str, status_id: str, in_reply_to_id: str, acct: str, content: str) -> dict:
+    account = {"id": f"acct-{acct}", "acct": acct, "bot": False}
+    return {
+        "id": notification_id,
+        "type": "mention",
+        "account": account,
+        "status": {"id": status_id, "in_reply_to_id": in_reply_to_id, "account": account, "content": content},
+    }
+
+def test_replies_in_the_same_thread_share_the_reply_cap(mention_filter):
+    first = mention("100", "11", "10", "alice", "<p>@bot what livery is this?</p>")
+    second = mention("101", "12", "11", "bob", "<p>@bot and which track?</p>")
+
+    assert asyncio.run(mention_filter.check(first)) is None
+    assert asyncio.run(mention_filter.check(second)) == "thread_cap"
+
+def test_replies_in_different_threads_are_capped_separately(mention_filter):
+    first = mention("100", "11", "10", "alice", "<p>@bot what livery is this?</p>")
+    other = mention("101", "20", None, "bob", "<p>@bot and which track?</p>")
+
+    assert asyncio.run(mention_filter.check(first)) is None
+    assert asyncio.run(mention_filter.check(other)) is None
+
+def test_refetched_notification_keeps_its_first_decision(mention_filter, monkeypatch):
+    monkeypatch.setattr(ingest.filters, "MENTION_ACCOUNT_LIMIT", 1)
+    first = mention("100", "11", "10", "alice", "<p>@bot what livery is this?</p>")
+
+    assert asyncio.run(mention_filter.check(first)) is None
+    # Same notification again, as catch-up returns it after a crash
+    assert asyncio.run(mention_filter.check(first)) is None
+
+def test_same_text_is_a_duplicate_only_for_the_same_account(mention_filter):
+    thanks = [
+        mention("100", "20", None, "alice", "<p>@bot thanks!</p>"),
+        mention("101", "21", None, "bob", "<p>@bot thanks!</p>"),
+        mention("102", "22", None, "alice", "<p>@bot Thanks!</p>"),
+    ]
+
+    assert [asyncio.run(mention_filter.check(n)) for n in thanks] == [None, None, "duplicate"]